@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=[],
+    hiddenimports=['moviepy', 'elevenlabs.client', 'aiohttp', 'runwayml', 'instabot'], # Imported lazily, see app/lazyimports.py
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -18,7 +18,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=added_files,
-    hiddenimports=[],
+    hiddenimports=['moviepy', 'elevenlabs.client', 'aiohttp', 'runwayml', 'instabot'], # Imported lazily, see app/lazyimports.py
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -1,33 +1,117 @@
+import time
+STARTED = time.perf_counter() # Before the imports, so the startup report includes them
+
+from lazyimports import eager
+# The heaviest imports, timed one by one for the startup report. The imports below find them loaded
+eager("editvideo")
+eager("fastapi")
+eager("uvicorn")
+
 import base64
 import os
-from typing import List
 import uuid
-import shutil
 import logging
 import asyncio
-import yaml
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
+import multiprocessing
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from appconfig import load_config
 from editvideo import VideoGenerator
-from runwayml import RunwayML
+from encodeprofiles import DEFAULT_PROFILE, load_profiles
+from jobqueue import JobQueue, generator_options_from_config
+from broker import create_broker
+from workspace import TempReaper, memory_root
+from runwaytasks import RunwayTaskManager
+from uploads import UPLOAD_CHUNK_SIZE, MalformedUpload, UploadTooLarge, held_uploads, receive_form, release_uploads
 import mimetypes
 import uvicorn
 from instagramPost import Instagram
+import metrics
+import lazyimports
+from lazyimports import LazyObject, lazy
+
+runwayml = lazy("runwayml")
 
 class VideoApp:
     def __init__(self):
         """Initialize the FastAPI app, dependencies, and configurations."""
         self.app = FastAPI()
-        self.config = self.load_config()
+        self.config = load_config()
         self.video_generator = VideoGenerator(self.config["elevenlabs_api_key"])
-        self.runway = RunwayML(api_key=self.config["runway_api_key"])
+        # Built on first use, the sdk import is only paid by the first runway request
+        self.runway = LazyObject(lambda: runwayml.RunwayML(api_key=self.config["runway_api_key"], base_url=self.config.get("runway_base_url")))
         self.temp_folder = "./temp"
-        self.instagram = Instagram(self.config["instagram_accounts"])
+        # Uploads and results, point it at a shared mount (same path on every host) when workers run elsewhere
+        self.shared_folder = self.config.get("shared_folder", self.temp_folder)
+        self.upload_folder = os.path.join(self.shared_folder, "uploads")
+        self.max_upload_bytes = self.config.get("max_upload_bytes", 512 * 1024 * 1024)
+        self.max_request_bytes = self.config.get("max_request_bytes", 2 * 1024 * 1024 * 1024)
+        self.encode_profiles = load_profiles(self.config.get("encode_profiles"))
+        self.result_ttl = self.config.get("result_ttl", 24 * 3600) # How long finished videos stay downloadable
+        self.instagram = Instagram(
+            self.config["instagram_accounts"],
+            session_folder=self.config.get("instagram_session_folder", "./instagram_sessions"),
+            max_workers=self.config.get("instagram_workers", 4),
+        )
 
         # Ensure temp directory exists
         os.makedirs(self.temp_folder, exist_ok=True)
+        os.makedirs(self.upload_folder, exist_ok=True)
+
+        # Renders run in a process pool, queued jobs are persisted in the broker so they survive a restart.
+        # With render_workers set to 0 the api only queues jobs and standalone workers (worker.py) render them
+        self.jobs = JobQueue(
+            self.config["elevenlabs_api_key"],
+            create_broker(self.config, os.path.join(self.temp_folder, "jobs.sqlite3")),
+            max_workers=self.config.get("render_workers", 2),
+            work_folder=os.path.join(self.temp_folder, "work"),
+            warm_up=self.config.get("warm_up_workers", True),
+            lease=self.config.get("job_lease", 60),
+            generator_options=generator_options_from_config(self.config),
+        )
+        self.app.add_event_handler("startup", self.jobs.start)
+        self.app.add_event_handler("startup", self.index_transitions)
+        self.app.add_event_handler("startup", self.report_startup)
+        self.app.add_event_handler("shutdown", self.jobs.stop)
+
+        # Keeps the uploads and results within their quota, files of unfinished jobs are protected
+        self.temp_reaper = TempReaper(
+            self.shared_folder,
+            max_bytes=self.config.get("temp_max_bytes", 10 * 1024 * 1024 * 1024),
+            max_age=self.config.get("temp_max_age", self.result_ttl),
+            interval=self.config.get("temp_sweep_interval", 300),
+            protect=self.protected_paths,
+            exclude=("jobs.sqlite3", "tts_cache"),
+        )
+        self.app.add_event_handler("startup", self.temp_reaper.start)
+        self.app.add_event_handler("shutdown", self.temp_reaper.stop)
+
+        # Subtitles and overlay images of crashed jobs would otherwise stay in RAM backed /dev/shm
+        memory_folder = memory_root(self.jobs.work_folder)
+        if memory_folder:
+            self.memory_reaper = TempReaper(
+                memory_folder,
+                max_bytes=self.config.get("memory_max_bytes", 512 * 1024 * 1024),
+                max_age=self.config.get("memory_max_age", 3600),
+                interval=self.config.get("temp_sweep_interval", 300),
+                protect=self.jobs.active_paths,
+                name="memory",
+                keep_top_level=False,
+            )
+            self.app.add_event_handler("startup", self.memory_reaper.start)
+            self.app.add_event_handler("shutdown", self.memory_reaper.stop)
+
+        # Runway tasks are submitted and polled off the event loop, finished clips can feed the subtitle pipeline
+        self.runway_tasks = RunwayTaskManager(
+            self.runway,
+            os.path.join(self.shared_folder, "runway"),
+            on_video=self.subtitle_runway_video,
+            min_interval=self.config.get("runway_poll_interval", 5),
+            max_interval=self.config.get("runway_max_poll_interval", 60),
+        )
+        self.app.add_event_handler("shutdown", self.runway_tasks.stop)
 
         # Configure CORS
         self.app.add_middleware(
@@ -45,15 +129,6 @@ class VideoApp:
         # Define API routes
         self.setup_routes()
 
-    def load_config(self, filename="config.yaml"):
-        """Load API keys from a YAML file."""
-        yaml_path = os.path.abspath(os.path.join(os.path.dirname(__file__), filename))
-        if not os.path.exists(yaml_path):
-            raise FileNotFoundError(f"YAML file not found: {yaml_path}")
-
-        with open(yaml_path, "r") as file:
-            return yaml.safe_load(file)
-
     def setup_routes(self):
         """Define API endpoints."""
 
@@ -62,84 +137,322 @@ class VideoApp:
             """Serve React frontend."""
             return FileResponse(os.path.join(self.react_build_path, "index.html"))
 
+        @self.app.get("/metrics")
+        def prometheus_metrics():
+            """Prometheus metrics: stage latencies, job outcomes, queue depth, bytes and cache hit rates."""
+            data, content_type = metrics.render_latest()
+            return Response(content=data, media_type=content_type)
+
         @self.app.post("/generate_video")
-        async def generate_video(background_tasks: BackgroundTasks, files: List[UploadFile] = File(...), text: str = Form(...), model_id: str = Form(...)):
-            """Generate a video with subtitles."""
-            try:
-                file_paths = []
-                for file in files:
-                    base_video_path = self.save_uploaded_file(file)
-                    file_paths.append(base_video_path)
-                    mime_type, _ = mimetypes.guess_type(file.filename)
+        async def generate_video(request: Request):
+            """
+            Queue a video with subtitles for rendering and return its job id.
+            Form fields: files (images or one video), text, model_id, and optionally engine, subtitle_mode and profile.
+            """
+            form = await self.read_form(request, "files", "text", "model_id")
 
+            try:
+                text = form.get("text")
                 output_video_filename = self.generate_output_filename(text)
-                output_video_path = os.path.join(self.temp_folder, output_video_filename)
+                output_video_path = os.path.join(self.shared_folder, output_video_filename)
+
+                engine = self.validate_engine(form.get("engine"))
+                profile = self.validate_profile(form.get("profile"))
+                subtitle_mode = form.get("subtitle_mode")
+                if subtitle_mode and subtitle_mode not in VideoGenerator.SUBTITLE_MODES:
+                    raise HTTPException(status_code=400, detail=f"Subtitle mode must be one of {', '.join(VideoGenerator.SUBTITLE_MODES)}.")
+
+                files = form.getlist("files")
+                file_paths = [upload.path for upload in files]
+                mime_type, _ = mimetypes.guess_type(files[-1].filename)
+
+                if mime_type and mime_type.startswith("image/"):
+                    # If the file is an image
+                    kind = "image"
+
+                elif mime_type and mime_type.startswith("video/"):
+                    kind = "video"
+
+                else:
+                    raise HTTPException(status_code=400, detail="Files must be images or a video.")
 
-                
+                job_id = await self.jobs.submit(kind, {"text": text, "files": file_paths, "output": output_video_path, "model_id": form.get("model_id"), "engine": engine, "subtitle_mode": subtitle_mode, "encode_profile": profile})
+                await self.hand_over_uploads(form)
 
-                if mime_type:
-                    if mime_type.startswith("image/"):  
-                        # If the file is an image
-                        generated_video_path = await self.video_generator.generate_subtitles_image(text, file_paths, output_video_path, model_id)
-                    
-                    elif mime_type.startswith("video/"):  
-                        generated_video_path = await self.video_generator.generate_subtitles_video(text, base_video_path, output_video_path, model_id)
-                
-               
+                return {"job_id": job_id, "status": (await self.jobs.get(job_id))["status"]}
 
-                # Schedule cleanup of temporary files
-                background_tasks.add_task(self.cleanup_files, base_video_path, generated_video_path)
+            except HTTPException:
+                await self.discard_uploads(form)
+                raise
 
-                return FileResponse(
-                    generated_video_path, media_type="video/mp4", filename=os.path.basename(generated_video_path)
-                )
+            except Exception as e:
+                await self.discard_uploads(form)
+                logging.error(f"Error while queueing video generation: {e}", exc_info=True)
+                raise HTTPException(status_code=500, detail="Internal Server Error")
+
+        @self.app.post("/generate_batch")
+        async def generate_batch(request: Request):
+            """
+            Queue several videos over the same narration, e.g. for A/B tests. The files are split into media
+            sets by set_sizes, a comma separated list of how many consecutive files belong to each set.
+            The result is a zip with one video per set and a manifest.
+            Form fields: files, text, model_id, set_sizes, and optionally engine and profile.
+            """
+            form = await self.read_form(request, "files", "text", "model_id", "set_sizes")
+
+            try:
+                files = form.getlist("files")
+                try:
+                    sizes = [int(size) for size in form.get("set_sizes").split(",")]
+                except ValueError:
+                    raise HTTPException(status_code=400, detail="set_sizes must be a comma separated list of integers.")
+
+                if not sizes or any(size < 1 for size in sizes) or sum(sizes) != len(files):
+                    raise HTTPException(status_code=400, detail="set_sizes must add up to the number of files.")
+
+                text = form.get("text")
+                output_zip_path = os.path.join(self.shared_folder, self.generate_output_filename(text).replace(".mp4", ".zip"))
+                engine = self.validate_engine(form.get("engine"))
+                profile = self.validate_profile(form.get("profile"))
+                file_paths = [upload.path for upload in files]
+
+                variants = []
+                offset = 0
+                for size in sizes:
+                    mime_type, _ = mimetypes.guess_type(files[offset + size - 1].filename)
+                    if not mime_type or not mime_type.startswith(("image/", "video/")):
+                        raise HTTPException(status_code=400, detail="Files must be images or a video.")
+
+                    variants.append({
+                        "kind": "image" if mime_type.startswith("image/") else "video",
+                        "files": file_paths[offset:offset + size],
+                        "output": os.path.join(self.shared_folder, f"variant_{uuid.uuid4()}.mp4"),
+                    })
+                    offset += size
+
+                job_id = await self.jobs.submit("batch", {
+                    "text": text, "files": file_paths, "variants": variants, "output": output_zip_path,
+                    "model_id": form.get("model_id"), "engine": engine, "encode_profile": profile, "variant_workers": self.config.get("variant_workers", 2),
+                })
+                await self.hand_over_uploads(form)
+
+                return {"job_id": job_id, "status": (await self.jobs.get(job_id))["status"]}
+
+            except HTTPException:
+                await self.discard_uploads(form)
+                raise
 
             except Exception as e:
-                logging.error(f"Error during video generation: {e}", exc_info=True)
+                await self.discard_uploads(form)
+                logging.error(f"Error while queueing batch generation: {e}", exc_info=True)
                 raise HTTPException(status_code=500, detail="Internal Server Error")
 
+        @self.app.get("/jobs/{job_id}")
+        async def job_status(job_id: str):
+            """Get the status of a render job."""
+            job = await self.get_job_or_404(job_id)
+            return {
+                "job_id": job_id,
+                "status": job["status"],
+                "error": job["error"],
+                "video_url": f"/videos/{job_id}" if job["status"] == "succeeded" else None,
+            }
+
+        @self.app.api_route("/videos/{job_id}", methods=["GET", "HEAD"])
+        async def stream_video(job_id: str, request: Request):
+            """
+            Stream the result of a finished render job. Results are kept for result_ttl seconds, supports
+            Range requests (seeking, resumed downloads) and If-None-Match revalidation.
+            """
+            return await self.result_response(job_id, request)
+
+        @self.app.get("/jobs/{job_id}/result")
+        async def job_result(job_id: str, request: Request):
+            """Download the video (or zip, for batch jobs) of a finished render job as an attachment."""
+            return await self.result_response(job_id, request, download=True)
+
+        @self.app.delete("/jobs/{job_id}")
+        async def cancel_job(job_id: str):
+            """
+            Cancel a queued or running render job. A running render is not interrupted, it finishes in the
+            background and its output is discarded.
+            """
+            await self.get_job_or_404(job_id)
+            job = await self.jobs.cancel(job_id)
+            return {"job_id": job_id, "status": job["status"]}
+
         @self.app.post("/post_to_instagram")
-        async def post_to_instagram(background_tasks: BackgroundTasks, caption: str = Form(...), file: UploadFile = File(...), tags: str = Form(...)):
-            """Post a video to all configured instagram accounts"""
+        async def post_to_instagram(request: Request):
+            """
+            Post a video to all configured instagram accounts, or only to the comma separated usernames in accounts
+            (e.g. to retry the accounts that failed last time).
+            Form fields: caption, file, tags, and optionally accounts.
+            """
+            form = await self.read_form(request, "caption", "file", "tags")
+            accounts = form.get("accounts")
+
             try:
-                video = self.save_uploaded_file(file)
-                await self.instagram.post_to_instagram(video, caption, tags)
+                video = form.getlist("file")[0].path
+                usernames = [username.strip() for username in accounts.split(",") if username.strip()] if accounts else None
+                results = await self.instagram.post_to_instagram(video, form.get("caption"), form.get("tags"), usernames)
+
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
 
             except Exception as e:
                 logging.error(f"Error during video post to instagram: {e}", exc_info=True)
+                raise HTTPException(status_code=500, detail="Internal Server Error")
 
+            finally:
+                await self.discard_uploads(form)
 
+            return {"success": all(result["success"] for result in results), "results": results}
 
         @self.app.post("/runway_generate")
-        async def runway_generate(
-            background_tasks: BackgroundTasks, prompt: str = Form(...), base_image: UploadFile = File(...)
-        ):
-            """Generate a video from an image using RunwayML."""
+        async def runway_generate(request: Request):
+            """
+            Generate a video from an image using RunwayML.
+            When text is given the finished clip is queued for subtitles and narration.
+            Form fields: prompt, base_image, and optionally text and model_id.
+            """
+            form = await self.read_form(request, "prompt", "base_image")
+            text = form.get("text")
+
             try:
-                base64_image = await self.encode_image_to_base64(base_image)
+                if text:
+                    self.generate_output_filename(text) # Validate the text before paying for the runway task
 
-                task = self.runway.image_to_video.create(
-                    model="gen3a_turbo",
-                    prompt_image=f"data:image/png;base64,{base64_image}",
-                    prompt_text=prompt,
-                )
+                base64_image = await self.encode_image_to_base64(form.getlist("base_image")[0].path)
+                task_id = await self.runway_tasks.submit(form.get("prompt"), f"data:image/png;base64,{base64_image}", text=text, voice_id=form.get("model_id"))
+                return {"task_id": task_id, "message": "Video generation task is being processed."}
 
-                background_tasks.add_task(self.poll_task_status, task.id)
-                return {"message": "Video generation task is being processed."}
+            except HTTPException:
+                raise
 
             except Exception as e:
                 logging.error(f"Error during RunwayML request: {e}", exc_info=True)
                 raise HTTPException(status_code=500, detail="Internal Server Error")
 
-    def save_uploaded_file(self, uploaded_file: UploadFile) -> str:
-        """Save an uploaded file to the temporary folder."""
-        filename = f"{uuid.uuid4()}_{uploaded_file.filename}"
-        file_path = os.path.join(self.temp_folder, filename)
+            finally:
+                await self.discard_uploads(form)
+
+        @self.app.get("/runway_tasks/{task_id}")
+        async def runway_task_status(task_id: str):
+            """Get the status of a RunwayML task and of its subtitle job, if any."""
+            task = self.runway_tasks.get(task_id)
+            if task is None:
+                raise HTTPException(status_code=404, detail="Task not found.")
+
+            return {
+                "task_id": task_id,
+                "status": task["status"],
+                "downloaded": task["result"] is not None,
+                "error": task["error"],
+                "video_job_id": task["video_job_id"],
+            }
+
+        @self.app.get("/runway_tasks/{task_id}/result")
+        async def runway_task_result(task_id: str):
+            """Download the video generated by a RunwayML task."""
+            task = self.runway_tasks.get(task_id)
+            if task is None:
+                raise HTTPException(status_code=404, detail="Task not found.")
+
+            if not task["result"] or not os.path.exists(task["result"]):
+                raise HTTPException(status_code=409, detail=f"Task is {task['status']}.")
+
+            return FileResponse(task["result"], media_type="video/mp4", filename=os.path.basename(task["result"]))
+
+    async def report_startup(self):
+        """Log how long the app took to come up, what the heavy imports cost and what each lazily loaded integration cost so far."""
+        lazyimports.log_report(time.perf_counter() - STARTED)
+
+    async def index_transitions(self):
+        """Normalize the transition library once at startup so render jobs find it ready."""
+        try:
+            await asyncio.to_thread(self.video_generator.transitions.refresh)
+        except Exception as e:
+            logging.error(f"Error indexing transitions: {e}", exc_info=True)
+
+    async def read_form(self, request: Request, *required: str):
+        """
+        Receive a multipart form, writing its files to the upload folder while the body streams in
+        so the upload size limits are enforced before anything oversized is stored.
+
+        :param required: Fields or files the route needs
+        :return: UploadedForm
+        """
+        try:
+            form = await receive_form(request, self.upload_folder, self.max_upload_bytes, self.max_request_bytes, protect=self.jobs.active_paths)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except MalformedUpload as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        missing = [name for name in required if form.get(name) is None and not form.getlist(name)]
+        if missing:
+            await self.discard_uploads(form)
+            raise HTTPException(status_code=400, detail=f"Missing form fields: {', '.join(missing)}.")
+
+        return form
+
+    def validate_engine(self, engine: str) -> str:
+        """Resolve the requested render engine, falling back to the configured default."""
+        engine = engine or self.config.get("render_engine", "moviepy")
+        if engine not in VideoGenerator.ENGINES:
+            raise HTTPException(status_code=400, detail=f"Engine must be one of {', '.join(VideoGenerator.ENGINES)}.")
+
+        return engine
+
+    def validate_profile(self, profile: str) -> str:
+        """
+        Resolve the requested encode profile, falling back to the configured default.
+        Lets callers trade quality for throughput per request, e.g. draft renders while the queue is deep.
+        """
+        profile = profile or self.config.get("encode_profile", DEFAULT_PROFILE)
+        if profile not in self.encode_profiles:
+            raise HTTPException(status_code=400, detail=f"Profile must be one of {', '.join(self.encode_profiles)}.")
+
+        return profile
+
+    async def result_response(self, job_id: str, request: Request, download: bool = False):
+        """
+        Serve a job's retained result. Outputs never change once rendered, so the ETag only depends on the
+        job and the file, and Starlette's FileResponse answers Range and If-Range requests.
+        """
+        job = await self.get_job_or_404(job_id)
+
+        if job["status"] != "succeeded":
+            raise HTTPException(status_code=409, detail=f"Job is {job['status']}.")
+
+        remaining = self.result_ttl - (time.time() - job["updated"])
+        if remaining <= 0 or not os.path.exists(job["result"]):
+            self.cleanup_files(job["result"])
+            raise HTTPException(status_code=410, detail="Result is no longer available.")
+
+        stat = os.stat(job["result"])
+        etag = f'"{job_id}-{stat.st_size}-{int(stat.st_mtime)}"'
+        headers = {"etag": etag, "cache-control": f"private, max-age={int(remaining)}"}
+
+        if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+            return Response(status_code=304, headers=headers)
+
+        media_type, _ = mimetypes.guess_type(job["result"])
+        return FileResponse(
+            job["result"],
+            media_type=media_type or "video/mp4",
+            headers=headers,
+            filename=os.path.basename(job["result"]) if download else None,
+            content_disposition_type="attachment" if download else "inline",
+        )
 
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(uploaded_file.file, buffer)
+    async def get_job_or_404(self, job_id: str) -> dict:
+        """Look up a render job, raising a 404 if it does not exist."""
+        job = await self.jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found.")
 
-        return file_path
+        return job
 
     def generate_output_filename(self, text: str) -> str:
         """Generate a unique output filename based on the text input."""
@@ -149,17 +462,27 @@ class VideoApp:
         
         return f"{words[0]}_{words[1]}_{words[2]}_{uuid.uuid4()}.mp4"
 
-    async def poll_task_status(self, task_id: str):
-        """Periodically check the status of a RunwayML task until completion."""
-        task = self.runway.tasks.retrieve(task_id)
-        while task.status not in ["SUCCEEDED", "FAILED"]:
-            await asyncio.sleep(10)
-            task = self.runway.tasks.retrieve(task_id)
+    async def subtitle_runway_video(self, task: dict):
+        """Queue a finished RunwayML clip for subtitles and narration when the task came with text."""
+        if not task["text"]:
+            return
+
+        output_video_path = os.path.join(self.shared_folder, self.generate_output_filename(task["text"]))
+        task["video_job_id"] = await self.jobs.submit(
+            "video", {"text": task["text"], "files": [task["result"]], "output": output_video_path, "model_id": task["voice_id"]}
+        )
+
+    async def encode_image_to_base64(self, image_path: str) -> str:
+        """Convert an image file to a Base64 string, reading it in chunks off the event loop."""
+        def encode():
+            parts = []
+            with open(image_path, "rb") as f:
+                # Chunk size is a multiple of 3 so the encoded parts concatenate without padding
+                while chunk := f.read(3 * (UPLOAD_CHUNK_SIZE // 3)):
+                    parts.append(base64.b64encode(chunk).decode("utf-8"))
+            return "".join(parts)
 
-    async def encode_image_to_base64(self, image: UploadFile) -> str:
-        """Convert an image file to a Base64 string."""
-        image_bytes = await image.read()
-        return base64.b64encode(image_bytes).decode("utf-8")
+        return await asyncio.to_thread(encode)
 
     def cleanup_files(self, *file_paths: str):
         """Delete temporary files after processing."""
@@ -170,12 +493,30 @@ class VideoApp:
             except Exception as e:
                 logging.error(f"Error deleting {path}: {e}")
 
+    async def discard_uploads(self, form):
+        """
+        Delete a form's uploads once its request is done with them. Uploads are shared by content hash, so
+        files another request still holds or a queued or running job uses are kept. Off the event loop, it
+        asks the broker which files are in use.
+        """
+        await asyncio.to_thread(release_uploads, form, self.jobs.active_paths)
+
+    async def hand_over_uploads(self, form):
+        """Release a form's uploads without deleting them, once the job they were queued for protects them."""
+        await asyncio.to_thread(release_uploads, form, removable=())
+
+    def protected_paths(self):
+        """Paths the temp reaper must keep: files of unfinished jobs and uploads of requests in flight."""
+        return self.jobs.active_paths() + held_uploads()
+
     def run(self):
         """Start the FastAPI app."""
-        logging.basicConfig(level=logging.DEBUG)
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(name)s %(levelname)s %(message)s")
         uvicorn.run(self.app, host="0.0.0.0", port=8000)
 
 # Run the app
 if __name__ == "__main__":
+    # Frozen (PyInstaller) builds start the render processes by re-running this executable, hand those over to the pool
+    multiprocessing.freeze_support()
     app_instance = VideoApp()
     app_instance.run()
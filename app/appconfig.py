@@ -0,0 +1,16 @@
+import os
+import yaml
+
+
+def load_config(filename="config.yaml"):
+    """
+    Load the app's YAML config, shared by the api and the standalone workers (worker.py).
+
+    :param filename: Config file, relative to the app folder
+    """
+    yaml_path = os.path.abspath(os.path.join(os.path.dirname(__file__), filename))
+    if not os.path.exists(yaml_path):
+        raise FileNotFoundError(f"YAML file not found: {yaml_path}")
+
+    with open(yaml_path, "r") as file:
+        return yaml.safe_load(file)
@@ -0,0 +1,323 @@
+"""
+End to end benchmark of the VideoGenerator pipeline.
+
+Runs against a local fake ElevenLabs server that returns canned audio and alignment, with
+synthetic images, videos and transitions generated by ffmpeg's lavfi sources, so no api key
+or media files are needed. Every run reports per stage timings, peak RSS and output fps and
+the results are stored as JSON so runs can be compared. Each case renders in a fresh process,
+so its peak RSS is its own and not the high-water mark of the cases before it.
+
+    python benchmark.py --images 3 10 --durations 10 30 --engines moviepy ffmpeg
+    python benchmark.py --modes video --durations 60 300 --subtitle-renderers libass overlay
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from aiohttp import web
+import ffmpeg
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from editvideo import VideoGenerator
+from fakeserver import ThreadedServer
+
+try:
+    import resource
+except ImportError:
+    resource = None # Windows, peak RSS is not reported
+
+
+class FakeElevenLabsServer(ThreadedServer):
+    """
+    Minimal stand in for the ElevenLabs api, serving the endpoints elevenlabs_calls uses.
+    Audio is a sine tone lasting seconds_per_char for every character of the text, the
+    alignment spreads the characters evenly over it.
+    """
+
+    def __init__(self, workdir, seconds_per_char=0.06, host="127.0.0.1", port=0):
+        super().__init__(host, port)
+        self.workdir = workdir
+        self.seconds_per_char = seconds_per_char
+        self.audio_cache = {}
+        self.requests = 0
+
+    @property
+    def api_base(self):
+        return f"{self.base_url}/v1"
+
+    def canned_audio(self, duration):
+        """Constant bitrate mp3 of the given duration, generated once per duration."""
+        duration = round(duration, 2)
+        if duration not in self.audio_cache:
+            path = os.path.join(self.workdir, f"tone_{duration}.mp3")
+            (
+                ffmpeg.input(f"sine=frequency=440:duration={duration}", f="lavfi")
+                .output(path, acodec="libmp3lame", audio_bitrate="128k", ar=44100)
+                .overwrite_output()
+                .run(quiet=True)
+            )
+            with open(path, "rb") as f:
+                self.audio_cache[duration] = f.read()
+
+        return self.audio_cache[duration]
+
+    def synthesize(self, text):
+        characters = list(text)
+        starts = [i * self.seconds_per_char for i in range(len(characters))]
+        ends = [start + self.seconds_per_char for start in starts]
+        audio = self.canned_audio(max(len(characters) * self.seconds_per_char, 0.1))
+
+        alignment = {
+            "characters": characters,
+            "character_start_times_seconds": starts,
+            "character_end_times_seconds": ends,
+        }
+        return audio, alignment
+
+    async def with_timestamps(self, request):
+        self.requests += 1
+        payload = await request.json()
+        audio, alignment = self.synthesize(payload["text"])
+
+        return web.json_response({"audio_base64": base64.b64encode(audio).decode("utf-8"), "alignment": alignment})
+
+    async def stream_with_timestamps(self, request):
+        self.requests += 1
+        payload = await request.json()
+        audio, alignment = self.synthesize(payload["text"])
+
+        response = web.StreamResponse()
+        await response.prepare(request)
+
+        # Two chunks, the way the real endpoint sends audio and alignment in pieces
+        audio_half = len(audio) // 2
+        char_half = len(alignment["characters"]) // 2
+        for audio_part, char_slice in ((audio[:audio_half], slice(0, char_half)), (audio[audio_half:], slice(char_half, None))):
+            chunk = {
+                "audio_base64": base64.b64encode(audio_part).decode("utf-8"),
+                "alignment": {field: values[char_slice] for field, values in alignment.items()},
+            }
+            await response.write(json.dumps(chunk).encode("utf-8") + b"\n")
+
+        await response.write_eof()
+        return response
+
+    async def listing(self, request):
+        return web.json_response({"voices": [], "models": []})
+
+    def application(self):
+        app = web.Application()
+        app.router.add_post("/v1/text-to-speech/{voice_id}/with-timestamps", self.with_timestamps)
+        app.router.add_post("/v1/text-to-speech/{voice_id}/stream/with-timestamps", self.stream_with_timestamps)
+        app.router.add_get("/v1/voices", self.listing)
+        app.router.add_get("/v1/models", self.listing)
+        return app
+
+
+def make_images(folder, count, width=1600, height=1200):
+    """Synthetic landscape test pattern images, so the crop path is exercised."""
+    paths = []
+    for i in range(count):
+        path = os.path.join(folder, f"image_{i}.png")
+        (
+            ffmpeg.input(f"testsrc2=size={width}x{height}:rate=1", f="lavfi")
+            .filter("hue", h=i * 40)
+            .output(path, vframes=1)
+            .overwrite_output()
+            .run(quiet=True)
+        )
+        paths.append(path)
+
+    return paths
+
+
+def make_video(path, duration, width=1080, height=1920, fps=30):
+    """Synthetic base video with a test pattern and a tone."""
+    video = ffmpeg.input(f"testsrc2=size={width}x{height}:rate={fps}:duration={duration}", f="lavfi")
+    audio = ffmpeg.input(f"sine=frequency=220:duration={duration}", f="lavfi")
+    ffmpeg.output(video, audio, path, vcodec="libx264", pix_fmt="yuv420p", acodec="aac").overwrite_output().run(quiet=True)
+    return path
+
+
+def make_transitions(folder, count=3, duration=1.0):
+    os.makedirs(folder, exist_ok=True)
+    for i in range(count):
+        path = os.path.join(folder, f"transition_{i}.mp4")
+        (
+            ffmpeg.input("mandelbrot=size=720x1280:rate=30", f="lavfi", t=duration)
+            .output(path, vcodec="libx264", pix_fmt="yuv420p")
+            .overwrite_output()
+            .run(quiet=True)
+        )
+
+
+def make_text(duration, seconds_per_char):
+    """Text whose narration lasts roughly duration seconds, split into short sentences."""
+    words = []
+    while len(" ".join(words)) * seconds_per_char < duration:
+        words.append("benchmark")
+        if len(words) % 8 == 0:
+            words[-1] += "."
+
+    return " ".join(words)
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process and of its largest child (ffmpeg), in MB.
+    ru_maxrss is a high-water mark over the process lifetime, which is why every case runs in its own process.
+
+    :return: (self, children), both None where the resource module is unavailable
+    """
+    if resource is None:
+        return None, None
+
+    scale = 1024 * 1024 if platform.system() == "Darwin" else 1024 # ru_maxrss is bytes on macOS, KB on Linux
+    return (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale,
+    )
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_case(api_base, seconds_per_char, workdir, mode, engine, image_count, duration, generator_options):
+    """Render one video and collect its measurements, runs in a process of its own (see run_isolated)."""
+    generator = VideoGenerator("benchmark", engine=engine, tts_options={"api_base": api_base, "cache_dir": None}, **generator_options)
+    generator.transitions.refresh() # The app indexes transitions at startup, keep it out of the timings
+
+    text = make_text(duration, seconds_per_char)
+    renderer = generator_options.get("subtitle_renderer", "libass")
+    output = os.path.join(workdir, "temp", f"bench_{mode}_{engine}_{renderer}_{image_count}_{duration}.mp4")
+
+    try:
+        if mode == "image":
+            images = make_images(os.path.join(workdir, "media"), image_count)
+            start = time.perf_counter()
+            asyncio.run(generator.generate_subtitles_image(text, images, output))
+        else:
+            base_video = make_video(os.path.join(workdir, "media", f"base_{duration}.mp4"), duration)
+            start = time.perf_counter()
+            asyncio.run(generator.generate_subtitles_video(text, base_video, output))
+        total = time.perf_counter() - start
+    finally:
+        asyncio.run(generator.creator.close())
+        generator.close()
+
+    probe = ffmpeg.probe(output)
+    video_stream = next(stream for stream in probe["streams"] if stream["codec_type"] == "video")
+    frames = int(video_stream.get("nb_frames") or round(float(probe["format"]["duration"]) * 30))
+    rss, children_rss = peak_rss_mb()
+
+    return {
+        "mode": mode,
+        "engine": engine,
+        "subtitle_renderer": renderer,
+        "images": image_count if mode == "image" else None,
+        "duration": duration,
+        "output_duration": float(probe["format"]["duration"]),
+        "total_seconds": total,
+        "stages": generator.stage_timings,
+        "frames": frames,
+        "output_fps": frames / total if total else None,
+        "peak_rss_mb": rss,
+        "peak_children_rss_mb": children_rss,
+    }
+
+
+def run_isolated(*args):
+    """Run one case in a fresh worker process and return its result."""
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        return pool.submit(run_case, *args).result()
+
+
+def format_mb(value):
+    return "n/a" if value is None else f"{value:.0f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["image"], choices=["image", "video"])
+    parser.add_argument("--engines", nargs="+", default=["moviepy"], choices=list(VideoGenerator.ENGINES))
+    parser.add_argument("--images", nargs="+", type=int, default=[5], help="Image counts to render (image mode)")
+    parser.add_argument("--durations", nargs="+", type=float, default=[10], help="Narration lengths in seconds")
+    parser.add_argument("--seconds-per-char", type=float, default=0.06, help="Speaking rate of the fake tts")
+    parser.add_argument("--stream-tts", action="store_true", help="Use the streaming tts endpoint")
+    parser.add_argument("--subtitle-format", default="srt", choices=list(VideoGenerator.SUBTITLE_FORMATS))
+    parser.add_argument("--subtitle-renderers", nargs="+", default=["libass"], choices=list(VideoGenerator.SUBTITLE_RENDERERS),
+                        help="Burned in subtitle renderers to compare, e.g. libass overlay")
+    parser.add_argument("--profile", default="standard", help="Encode profile, see encodeprofiles.py")
+    parser.add_argument("--output", default=None, help="Results file, defaults to bench_results/<timestamp>.json")
+    parser.add_argument("--keep", action="store_true", help="Keep the working directory with the rendered videos")
+    args = parser.parse_args()
+
+    output_path = os.path.abspath(args.output or os.path.join("bench_results", f"{time.strftime('%Y%m%d_%H%M%S')}.json"))
+    commit = git_commit()
+
+    workdir = tempfile.mkdtemp(prefix="genpipeline_bench_")
+    cwd = os.getcwd()
+    server = FakeElevenLabsServer(workdir, seconds_per_char=args.seconds_per_char).start()
+
+    generator_options = {"stream_tts": args.stream_tts, "subtitle_format": args.subtitle_format, "encode_profile": args.profile}
+    results = []
+
+    try:
+        # VideoGenerator works with paths relative to the working directory (./temp, ./transitions)
+        os.chdir(workdir)
+        os.makedirs("temp", exist_ok=True)
+        os.makedirs("media", exist_ok=True)
+        make_transitions("transitions")
+
+        for mode in args.modes:
+            for engine in args.engines:
+                if mode == "video" and engine != args.engines[0]:
+                    continue # The engine only changes how images are rendered
+
+                for renderer in args.subtitle_renderers:
+                    for duration in args.durations:
+                        for image_count in (args.images if mode == "image" else [None]):
+                            result = run_isolated(server.api_base, server.seconds_per_char, workdir, mode, engine, image_count, duration,
+                                                  {**generator_options, "subtitle_renderer": renderer})
+                            results.append(result)
+
+                            stages = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in result["stages"].items())
+                            print(f"[{mode}/{engine}/{renderer} images={image_count} duration={duration}s] total {result['total_seconds']:.2f}s, "
+                                  f"{result['output_fps']:.1f} fps, peak rss {format_mb(result['peak_rss_mb'])} | {stages}")
+
+    finally:
+        os.chdir(cwd)
+        server.stop()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": commit,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+            "tts_requests": server.requests,
+            "results": results,
+        }, f, indent=2)
+
+    print(f"Results written to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
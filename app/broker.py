@@ -0,0 +1,484 @@
+import json
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+import uuid
+from lazyimports import lazy
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+redis = lazy("redis")
+
+
+class Broker(ABC):
+    """
+    Where render jobs are queued and tracked. The api submits jobs and reads their status, render workers
+    (in the api process or started separately with worker.py, on any host) claim queued jobs and report back.
+
+    A claimed job is leased to its worker: the worker heartbeats while rendering and jobs whose heartbeat
+    stopped (the worker died or was restarted) are put back in the queue by requeue_stale.
+
+    Jobs are dicts with id, kind, status, params, result, error, worker, created and updated.
+    """
+
+    @abstractmethod
+    def add(self, kind, params):
+        """Insert a new queued job and return its id."""
+
+    @abstractmethod
+    def get(self, job_id):
+        """Return a job, or None if it does not exist."""
+
+    @abstractmethod
+    def update(self, job_id, status, result=None, error=None, expected=(), worker=None):
+        """
+        Move a job to a new status, optionally recording its result or error. The checks are part of the
+        same atomic write, so e.g. a cancel and a worker reporting success can't overwrite each other.
+
+        :param expected: Only move the job if it is in one of these statuses
+        :param worker: Only move the job if it is leased to this worker
+        :return: Whether the job was moved
+        """
+
+    @abstractmethod
+    def claim(self, worker_id, timeout=1.0):
+        """
+        Take the oldest queued job and mark it running for worker_id.
+
+        :param timeout: Seconds to wait for a job when the queue is empty
+        :return: The job, or None if nothing was queued
+        """
+
+    @abstractmethod
+    def heartbeat(self, job_id):
+        """Extend the lease of a running job."""
+
+    @abstractmethod
+    def requeue(self, job_id):
+        """Put a running job back in the queue, e.g. after its render process died."""
+
+    @abstractmethod
+    def requeue_stale(self, lease):
+        """
+        Put running jobs whose last heartbeat is older than lease seconds back in the queue.
+
+        :return: Ids of the requeued jobs
+        """
+
+    @abstractmethod
+    def count(self, status):
+        """Number of jobs in a status."""
+
+    @abstractmethod
+    def unfinished(self):
+        """Ids of queued or running jobs, oldest first."""
+
+    def close(self):
+        pass
+
+
+class SQLiteBroker(Broker):
+    """
+    Local backend: a SQLite database, so queued work survives a restart. Several worker processes on the
+    same host can share it (WAL mode, claims are a single atomic UPDATE), across hosts use RedisBroker.
+    """
+
+    def __init__(self, db_path, poll_interval=0.5):
+        """
+        :param poll_interval: Seconds between checks for new jobs while claim is waiting
+        """
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL
+                )
+                """
+            )
+
+            # Databases created before jobs were leased to workers
+            columns = [row["name"] for row in self.conn.execute("PRAGMA table_info(jobs)")]
+            if "worker" not in columns:
+                self.conn.execute("ALTER TABLE jobs ADD COLUMN worker TEXT")
+
+            self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+
+    def add(self, kind, params):
+        job_id = str(uuid.uuid4())
+        now = time.time()
+
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO jobs (id, kind, status, params, created, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, json.dumps(params), now, now),
+            )
+
+        return job_id
+
+    def get(self, job_id):
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+        if row is None:
+            return None
+
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        return job
+
+    def update(self, job_id, status, result=None, error=None, expected=(), worker=None):
+        query = "UPDATE jobs SET status = ?, result = COALESCE(?, result), error = COALESCE(?, error), updated = ? WHERE id = ?"
+        args = [status, result, error, time.time(), job_id]
+
+        if expected:
+            query += f" AND status IN ({', '.join('?' * len(expected))})"
+            args += expected
+        if worker is not None:
+            query += " AND worker = ?"
+            args.append(worker)
+
+        with self.lock, self.conn:
+            return self.conn.execute(query, args).rowcount > 0
+
+    def claim(self, worker_id, timeout=1.0):
+        deadline = time.monotonic() + timeout
+
+        while True:
+            with self.lock, self.conn:
+                row = self.conn.execute(
+                    """
+                    UPDATE jobs SET status = ?, worker = ?, updated = ?
+                    WHERE id = (SELECT id FROM jobs WHERE status = ? ORDER BY created LIMIT 1)
+                    RETURNING id
+                    """,
+                    (RUNNING, worker_id, time.time(), QUEUED),
+                ).fetchone()
+
+            if row is not None:
+                return self.get(row["id"])
+
+            if time.monotonic() >= deadline:
+                return None
+
+            time.sleep(min(self.poll_interval, max(0, deadline - time.monotonic())))
+
+    def heartbeat(self, job_id):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE jobs SET updated = ? WHERE id = ? AND status = ?", (time.time(), job_id, RUNNING))
+
+    def requeue(self, job_id):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, worker = NULL, updated = ? WHERE id = ? AND status = ?",
+                (QUEUED, time.time(), job_id, RUNNING),
+            )
+
+    def requeue_stale(self, lease):
+        with self.lock, self.conn:
+            rows = self.conn.execute(
+                "UPDATE jobs SET status = ?, worker = NULL, updated = ? WHERE status = ? AND updated < ? RETURNING id",
+                (QUEUED, time.time(), RUNNING, time.time() - lease),
+            ).fetchall()
+
+        return [row["id"] for row in rows]
+
+    def count(self, status):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+    def unfinished(self):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created", (QUEUED, RUNNING)
+            ).fetchall()
+
+        return [row["id"] for row in rows]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class RedisBroker(Broker):
+    """
+    Shared backend for workers on several hosts. Works with any client exposing the redis-py commands
+    used here (hset, hget, hgetall, rpush, blpop, sadd, srem, smembers, scard and transaction), so it can
+    run against a redis server, a compatible one (Valkey, KeyDB, ...), fakeredis or LocalRedis in tests.
+
+    Every job is a hash, the queue is a list of ids and every status has a set of ids. Status changes
+    are WATCH/MULTI transactions on the job's hash, so they can't interleave across workers and the api.
+    """
+
+    def __init__(self, client, prefix="genpipeline"):
+        """
+        :param client: redis.Redis (or compatible) client
+        :param prefix: Namespace of the keys, lets several deployments share a server
+        """
+        self.client = client
+        self.prefix = prefix
+        self.queue_key = f"{prefix}:queue"
+
+    @classmethod
+    def from_url(cls, url, prefix="genpipeline"):
+        """Connect with redis-py, imported only when a redis broker is configured."""
+        return cls(redis.Redis.from_url(url), prefix)
+
+    def job_key(self, job_id):
+        return f"{self.prefix}:job:{job_id}"
+
+    def status_key(self, status):
+        return f"{self.prefix}:status:{status}"
+
+    @staticmethod
+    def decode(value):
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    def change_status(self, job_id, status, fields=None, expected=(), worker=None, updated_before=None, enqueue=False):
+        """
+        Move a job to a new status in one WATCH/MULTI transaction, retried when the job changes in between,
+        so e.g. a cancel landing while a worker claims the job is never overwritten to running.
+
+        :param expected: Only move the job if it is in one of these statuses
+        :param worker: Only move the job if it is leased to this worker
+        :param updated_before: Only move the job if it was last updated before this time
+        :param enqueue: Also push the job onto the queue
+        :return: The status the job was moved from, or None if it does not exist or didn't qualify
+        """
+        key = self.job_key(job_id)
+
+        def move(pipe):
+            job = {self.decode(name): self.decode(value) for name, value in pipe.hgetall(key).items()}
+            pipe.multi()
+
+            old_status = job.get("status")
+            if old_status is None or (expected and old_status not in expected):
+                return None
+            if worker is not None and job.get("worker") != worker:
+                return None
+            if updated_before is not None and float(job["updated"]) >= updated_before:
+                return None
+
+            pipe.hset(key, mapping={"status": status, "updated": time.time(), **(fields or {})})
+            if old_status != status:
+                pipe.srem(self.status_key(old_status), job_id)
+                pipe.sadd(self.status_key(status), job_id)
+            if enqueue:
+                pipe.rpush(self.queue_key, job_id)
+
+            return old_status
+
+        return self.client.transaction(move, key, value_from_callable=True)
+
+    def add(self, kind, params):
+        job_id = str(uuid.uuid4())
+        now = time.time()
+
+        self.client.hset(self.job_key(job_id), mapping={
+            "id": job_id, "kind": kind, "status": QUEUED, "params": json.dumps(params), "created": now, "updated": now,
+        })
+        self.client.sadd(self.status_key(QUEUED), job_id)
+        self.client.rpush(self.queue_key, job_id)
+
+        return job_id
+
+    def get(self, job_id):
+        fields = {self.decode(key): self.decode(value) for key, value in self.client.hgetall(self.job_key(job_id)).items()}
+        if not fields:
+            return None
+
+        return {
+            "id": fields["id"],
+            "kind": fields["kind"],
+            "status": fields["status"],
+            "params": json.loads(fields["params"]),
+            "result": fields.get("result") or None,
+            "error": fields.get("error") or None,
+            "worker": fields.get("worker") or None,
+            "created": float(fields["created"]),
+            "updated": float(fields["updated"]),
+        }
+
+    def update(self, job_id, status, result=None, error=None, expected=(), worker=None):
+        fields = {}
+        if result is not None:
+            fields["result"] = result
+        if error is not None:
+            fields["error"] = error
+
+        return self.change_status(job_id, status, fields, expected=expected, worker=worker) is not None
+
+    def claim(self, worker_id, timeout=1.0):
+        deadline = time.monotonic() + timeout
+
+        while True:
+            # The pop is atomic, so every id in the queue is handed to exactly one worker
+            popped = self.client.blpop([self.queue_key], timeout=max(1, int(deadline - time.monotonic())))
+            if popped is None:
+                return None
+
+            job_id = self.decode(popped[1])
+            if self.change_status(job_id, RUNNING, {"worker": worker_id}, expected=(QUEUED,)):
+                return self.get(job_id)
+
+            # Cancelled while queued, look for the next one
+            if time.monotonic() >= deadline:
+                return None
+
+    def heartbeat(self, job_id):
+        self.client.hset(self.job_key(job_id), "updated", time.time())
+
+    def requeue(self, job_id):
+        self.change_status(job_id, QUEUED, {"worker": ""}, expected=(RUNNING,), enqueue=True)
+
+    def requeue_stale(self, lease):
+        requeued = []
+        cutoff = time.time() - lease
+
+        for job_id in self.client.smembers(self.status_key(RUNNING)):
+            job_id = self.decode(job_id)
+            # Rechecked inside the transaction, the job may have heartbeated or finished since
+            if self.change_status(job_id, QUEUED, {"worker": ""}, expected=(RUNNING,), updated_before=cutoff, enqueue=True):
+                requeued.append(job_id)
+
+        return requeued
+
+    def count(self, status):
+        return self.client.scard(self.status_key(status))
+
+    def unfinished(self):
+        ids = [self.decode(job_id) for status in (QUEUED, RUNNING) for job_id in self.client.smembers(self.status_key(status))]
+        jobs = [job for job in (self.get(job_id) for job_id in ids) if job is not None]
+        return [job["id"] for job in sorted(jobs, key=lambda job: job["created"])]
+
+
+class LocalRedis:
+    """
+    In-process stand-in for the redis commands RedisBroker uses, for tests and single host setups without
+    a redis server. Values are stored as strings like redis does.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.condition = threading.Condition(threading.RLock())
+
+    def hset(self, name, key=None, value=None, mapping=None):
+        with self.condition:
+            fields = self.data.setdefault(name, {})
+            if key is not None:
+                fields[key] = str(value)
+            for field, field_value in (mapping or {}).items():
+                fields[field] = str(field_value)
+
+    def hget(self, name, key):
+        with self.condition:
+            return self.data.get(name, {}).get(key)
+
+    def hgetall(self, name):
+        with self.condition:
+            return dict(self.data.get(name, {}))
+
+    def rpush(self, name, *values):
+        with self.condition:
+            self.data.setdefault(name, []).extend(values)
+            self.condition.notify_all()
+
+    def blpop(self, keys, timeout=0):
+        deadline = time.monotonic() + timeout if timeout else None
+
+        with self.condition:
+            while True:
+                for key in keys:
+                    if self.data.get(key):
+                        return key, self.data[key].pop(0)
+
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+
+    def sadd(self, name, *values):
+        with self.condition:
+            self.data.setdefault(name, set()).update(values)
+
+    def srem(self, name, *values):
+        with self.condition:
+            self.data.get(name, set()).difference_update(values)
+
+    def smembers(self, name):
+        with self.condition:
+            return set(self.data.get(name, set()))
+
+    def scard(self, name):
+        with self.condition:
+            return len(self.data.get(name, set()))
+
+    def transaction(self, func, *watches, value_from_callable=False):
+        """
+        Run func with a pipeline like redis-py's transaction. The (reentrant) lock is held throughout, so the
+        watched keys can't change in between and there is nothing to retry.
+        """
+        with self.condition:
+            pipe = LocalPipeline(self)
+            value = func(pipe)
+            results = pipe.execute()
+
+        return value if value_from_callable else results
+
+
+class LocalPipeline:
+    """Transaction of LocalRedis: commands run right away until multi(), then queue up for execute()."""
+
+    def __init__(self, client):
+        self.client = client
+        self.queued = None
+
+    def multi(self):
+        self.queued = []
+
+    def execute(self):
+        results = [command(*args, **kwargs) for command, args, kwargs in self.queued or []]
+        self.queued = None
+        return results
+
+    def __getattr__(self, name):
+        command = getattr(self.client, name)
+        if self.queued is None:
+            return command
+
+        return lambda *args, **kwargs: self.queued.append((command, args, kwargs))
+
+
+def create_broker(config, default_db_path):
+    """
+    Build the broker selected in config.yaml: broker "sqlite" (job_db) or "redis" (redis_url, redis_prefix).
+    """
+    kind = config.get("broker", "sqlite")
+
+    if kind == "sqlite":
+        return SQLiteBroker(config.get("job_db", default_db_path))
+
+    if kind == "redis":
+        return RedisBroker.from_url(config["redis_url"], config.get("redis_prefix", "genpipeline"))
+
+    raise ValueError(f"Unknown broker: {kind}")
@@ -1,66 +1,306 @@
 import asyncio
 import random
+from lazyimports import eager, lazy
+# Imported ahead of the modules below, which use them too, so the api's startup report times each one
+np = eager("numpy")
+Image = eager("PIL.Image")
+ffmpeg = eager("ffmpeg")
 from elevenapi import elevenlabs_calls
-from moviepy import *
+from transitionlibrary import TransitionLibrary
+from subtitles import OVERLAY_SUFFIX, AssStyle, build_ass, build_overlay_sequence, remove_subtitle_file, write_subtitle_file
+from mediaprobe import media_probe
+from metrics import span
+from encodeprofiles import DEFAULT_PROFILE, load_profiles
+from workspace import Workspace
 import uuid
 import os
 import subprocess
 from pathlib import Path
-import ffmpeg
-import tempfile
 import time
+import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+moviepy = lazy("moviepy")
 
 class VideoGenerator():
 
-    def __init__(self, api_key):
-        self.creator = elevenlabs_calls(api_key)
+    ENGINES = ("moviepy", "ffmpeg")
+    SUBTITLE_FORMATS = ("ass", "srt")
+    SUBTITLE_MODES = ("burn", "soft")
+    SUBTITLE_RENDERERS = ("libass", "overlay")
+
+    def __init__(self, api_key, engine="moviepy", clip_workers=None, stream_tts=False, tts_chunk_chars=1000, subtitle_format="srt", tts_options=None,
+                 subtitle_mode="burn", encode_profile=DEFAULT_PROFILE, encode_profiles=None, workspace=None,
+                 subtitle_renderer="libass", tts_client=None, encode_threads=None):
+        """
+        :param api_key: ElevenLabs api key
+        :param engine: Renderer used for image jobs, "moviepy" (clip per image + moviepy composite)
+                       or "ffmpeg" (single filter_complex, one encode)
+        :param clip_workers: How many images are decoded and cropped at once, defaults to min(4, cpu count)
+        :param stream_tts: Stream the narration straight to a file instead of buffering the whole tts response
+        :param tts_chunk_chars: Texts longer than this are narrated as parallel sentence chunks, None disables chunking
+        :param subtitle_format: "srt" for plain subtitles or "ass" for styled karaoke subtitles
+        :param tts_options: Extra elevenlabs_calls keyword arguments (api_base, cache_dir, max_concurrency, ...)
+        :param subtitle_mode: "burn" hard codes the subtitles, "soft" adds them as a subtitle track on every engine
+                              and stream copies base videos that already match the output format
+        :param encode_profile: Name of the encode profile (crf, preset, tune, gop, faststart) used for every encode
+        :param encode_profiles: encode_profiles section of config.yaml, overrides or adds to the built in profiles
+        :param workspace: Workspace the intermediate files are written to, the job runner passes one per job.
+                          Without one the generator creates its own, which close() removes
+        :param subtitle_renderer: How burned in subtitles are drawn, "libass" (subtitles filter, rasterized every frame)
+                                  or "overlay" (every cue rasterized once to a PNG and overlaid), soft subtitles are always text
+        :param tts_client: elevenlabs_calls to narrate with instead of building one from tts_options, render processes
+                           share one across their jobs
+        :param encode_threads: Threads per final encode, None lets ffmpeg use every core. The job queue splits the
+                               cores between its render processes
+        """
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown render engine: {engine}")
+        if subtitle_format not in self.SUBTITLE_FORMATS:
+            raise ValueError(f"Unknown subtitle format: {subtitle_format}")
+        if subtitle_mode not in self.SUBTITLE_MODES:
+            raise ValueError(f"Unknown subtitle mode: {subtitle_mode}")
+        if subtitle_renderer not in self.SUBTITLE_RENDERERS:
+            raise ValueError(f"Unknown subtitle renderer: {subtitle_renderer}")
+
+        profiles = load_profiles(encode_profiles)
+        if encode_profile not in profiles:
+            raise ValueError(f"Unknown encode profile: {encode_profile}")
+
+        self.creator = tts_client or elevenlabs_calls(api_key, **(tts_options or {}))
         self.transitions_folder = "./transitions"
+        self.transitions = TransitionLibrary(self.transitions_folder)
+        self.probe = media_probe
+        self.engine = engine
+        self.stream_tts = stream_tts
+        self.tts_chunk_chars = tts_chunk_chars
+        self.subtitle_format = subtitle_format
+        self.subtitle_mode = subtitle_mode
+        self.subtitle_renderer = subtitle_renderer
+        self.subtitle_style = AssStyle()
+        self.profile = profiles[encode_profile]
+        self.encode_threads = encode_threads
+        self.owns_workspace = workspace is None
+        self.workspace = workspace or Workspace()
+
+        self.clip_workers = clip_workers or min(4, os.cpu_count() or 1)
+
+        # Wall clock seconds spent per pipeline stage, stages running on several threads add up
+        self.stage_timings = {}
+        self.stage_lock = threading.Lock()
+        self.job_id = None # Set by the job runner, tags the stage log lines
+
+    def close(self):
+        """Remove the intermediate files of the workspace this generator created, a passed in one is left to its owner."""
+        if self.owns_workspace:
+            self.workspace.close()
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time a pipeline stage (tts, subtitles, probe, image_decode, composite, final_encode)
+        """
+        start = time.perf_counter()
+        try:
+            # Timings are reported with the job result, a render worker's histograms are never scraped
+            with span(name, self.job_id, observe=False):
+                yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.stage_lock:
+                self.stage_timings[name] = self.stage_timings.get(name, 0.0) + elapsed
 
     def add_subtitles_to_video(self, output_video_file, audio_and_timings, video_file_path=None, images=None):
         """
         FFMPEG
         Use a base video and audio file, stitch them together and add hard coded subtitles to the final video.
-        """
-        audio_file = os.path.normpath(tempfile.NamedTemporaryFile(delete=False, suffix=".mp3").name)
-        srt_file = f'temp/{str(uuid.uuid4())}.srt'
 
+        :param audio_and_timings: (audio, word timings), audio is either the mp3 bytes or the path of an
+                                  mp3 file that was already streamed to disk, it is deleted when done
+        """
+        audio_file, subtitle_file, audio_duration = self.prepare_narration(audio_and_timings)
 
         try:
-            with open(audio_file, "wb") as f:
-                f.write(audio_and_timings[0])
+            self.render_narrated_video(output_video_file, audio_file, subtitle_file, audio_duration, video_file_path, images)
 
+        finally:
+            self.remove_narration(audio_file, subtitle_file)
 
-            with open(srt_file, "w", encoding="utf-8") as f:
-                f.write(self.create_srt_from_dict_timed(audio_and_timings[1]))
-            
-            print(srt_file)
+        return output_video_file
 
+    def prepare_narration(self, audio_and_timings):
+        """
+        Write the narration audio and its subtitles to disk once, so they can be shared by several renders.
 
-            audio_duration = self.get_audio_duration(audio_file)
+        :return: (audio_file, subtitle_file, audio_duration), remove the files with remove_narration
+        """
+        audio = audio_and_timings[0]
+        if isinstance(audio, (bytes, bytearray)):
+            audio_file = self.workspace.file(".mp3", "narration_")
+        else:
+            audio_file = audio
+
+        subtitle_file = None
+
+
+        try:
+            if isinstance(audio, (bytes, bytearray)):
+                with open(audio_file, "wb") as f:
+                    f.write(audio)
+
+
+            with self.stage("subtitles"):
+                if self.subtitle_renderer == "overlay" and self.subtitle_mode == "burn":
+                    subtitle_file = build_overlay_sequence(audio_and_timings[1], self.workspace, style=self.subtitle_style, karaoke=self.subtitle_format == "ass")
+                elif self.subtitle_format == "ass":
+                    subtitle_file = write_subtitle_file(build_ass(audio_and_timings[1], style=self.subtitle_style), ".ass", self.workspace)
+                else:
+                    subtitle_file = write_subtitle_file(self.create_srt_from_dict_timed(audio_and_timings[1]), ".srt", self.workspace)
             
-            if not video_file_path:
-                transition_clips = [os.path.abspath(os.path.join(self.transitions_folder, clip)) for clip in os.listdir(self.transitions_folder)]
-                print(transition_clips)
-                video_file_path = self.create_video_from_images(images, transition_clips, audio_duration)
+            logger.debug("Subtitles written to %s", subtitle_file)
+
+
+            audio_duration = self.get_audio_duration(audio_file, audio_and_timings[1])
+
+        except Exception:
+            self.remove_narration(audio_file, subtitle_file)
+            raise
+
+        return audio_file, subtitle_file, audio_duration
+
+    def remove_narration(self, audio_file, subtitle_file):
+        os.remove(audio_file)
+        if subtitle_file:
+            remove_subtitle_file(subtitle_file)
+
+    def burn_subtitles(self, video, subtitle_file):
+        """
+        FFMPEG
+        Draw the subtitles onto a video stream, with libass or by overlaying the pre-rasterized cue images.
+        """
+        if subtitle_file.endswith(OVERLAY_SUFFIX):
+            cues = ffmpeg.input(subtitle_file, f="concat", safe=0).video
+            return ffmpeg.overlay(video, cues, x=0, y=self.subtitle_style.overlay_y(), eof_action="pass")
+
+        return video.filter("subtitles", subtitle_file)
 
-            input_video = ffmpeg.input(video_file_path, stream_loop=-1).video.filter("subtitles", f"{srt_file}")
-            input_audio = ffmpeg.input(audio_file)
-            print(audio_duration)
+    def subtitle_streams(self, video, subtitle_file):
+        """
+        FFMPEG
+        Apply the subtitle mode to a video stream: burn the subtitles in, or in soft mode leave the video
+        alone and mux them as a mov_text track that players can toggle.
+
+        :return: (video stream, extra output streams, extra output arguments)
+        """
+        if self.subtitle_mode == "soft":
+            return video, [ffmpeg.input(subtitle_file)], {"scodec": "mov_text", "metadata:s:s:0": "language=und"}
+
+        return self.burn_subtitles(video, subtitle_file), [], {}
+
+    def render_narrated_video(self, output_video_file, audio_file, subtitle_file, audio_duration, video_file_path=None, images=None):
+        """
+        Render a base video or images with already prepared narration audio and subtitles.
+        """
+        render_start = time.perf_counter()
+        
+        if not video_file_path:
+            transition_clips = self.transitions.clips()
+            logger.debug("Transition clips: %s", transition_clips)
+
+            if self.engine == "ffmpeg":
+                with self.stage("final_encode"):
+                    self.render_images_single_pass(output_video_file, images, transition_clips, audio_file, subtitle_file, audio_duration)
+                logger.info("job_id=%s rendered with %s engine in %.2fs", self.job_id, self.engine, time.perf_counter() - render_start)
+                return output_video_file
+
+            stitched_video = video_file_path = self.create_video_from_images(images, transition_clips, audio_duration)
+        else:
+            stitched_video = None
 
-            ffmpeg.concat(input_video, input_audio, v=1, a=1).output(output_video_file, vcodec='libx264', audio_bitrate='192k', t=audio_duration).run()
+        logger.debug("Audio duration: %.2fs", audio_duration)
+
+        try:
+            if self.is_output_compatible(video_file_path, audio_duration):
+                # Already 1080x1920 h264 and long enough: no looping, and only re-encode if subtitles are burned in
+                with self.stage("final_encode"):
+                    self.render_compatible_video(output_video_file, video_file_path, audio_file, subtitle_file, audio_duration)
+
+            else:
+                input_video, subtitle_tracks, subtitle_args = self.subtitle_streams(ffmpeg.input(video_file_path, stream_loop=-1).video, subtitle_file)
+                input_audio = ffmpeg.input(audio_file).audio
+
+                with self.stage("final_encode"):
+                    ffmpeg.output(
+                        input_video, input_audio, *subtitle_tracks, output_video_file,
+                        audio_bitrate=self.profile.audio_bitrate, t=audio_duration, **self.profile.output_args(self.encode_threads), **subtitle_args
+                    ).overwrite_output().run()
 
         finally:
-            os.remove(audio_file)
-            os.remove(srt_file)
+            # Free the stitched video right away, batch jobs render several before their workspace is closed
+            if stitched_video and os.path.exists(stitched_video):
+                os.remove(stitched_video)
+
+        logger.info("job_id=%s rendered with %s engine in %.2fs", self.job_id, self.engine, time.perf_counter() - render_start)
 
         return output_video_file
     
 
+    def is_output_compatible(self, video_file, audio_duration, width=1080, height=1920):
+        """
+        Whether a base video can be used as is: h264 yuv420p at the output resolution and at least as long
+        as the narration (within one frame), so it needs neither scaling nor looping.
+        """
+        with self.stage("probe"):
+            metadata = self.probe.probe(video_file)
+
+        video_stream = next((stream for stream in metadata["streams"] if stream["codec_type"] == "video"), None)
+        if video_stream is None:
+            return False
+
+        return (
+            video_stream.get("codec_name") == "h264"
+            and video_stream.get("pix_fmt") == "yuv420p"
+            and metadata["width"] == width
+            and metadata["height"] == height
+            and (metadata["duration"] or 0) >= audio_duration - 1 / 30
+        )
+
+    def render_compatible_video(self, output_video_file, video_file_path, audio_file, subtitle_file, audio_duration):
+        """
+        FFMPEG
+        Fast path for base videos that already match the output format.
+        In soft mode the video is stream copied and the audio and subtitles are muxed as extra tracks,
+        otherwise the subtitles are burned in, which skips the looping and concat of the generic path.
+        """
+        input_video = ffmpeg.input(video_file_path).video
+        input_audio = ffmpeg.input(audio_file).audio
+
+        if self.subtitle_mode == "soft":
+            input_video, subtitle_tracks, subtitle_args = self.subtitle_streams(input_video, subtitle_file)
+            output = ffmpeg.output(
+                input_video, input_audio, *subtitle_tracks, output_video_file,
+                vcodec="copy", acodec="aac", audio_bitrate=self.profile.audio_bitrate, t=audio_duration,
+                **self.profile.mux_args(), **subtitle_args
+            )
+        else:
+            output = ffmpeg.output(
+                self.burn_subtitles(input_video, subtitle_file), input_audio, output_video_file,
+                audio_bitrate=self.profile.audio_bitrate, t=audio_duration, **self.profile.output_args(self.encode_threads)
+            )
+
+        output.overwrite_output().run()
+
+        return output_video_file
+
     def crossfade_with_moviepy(self, video_clips, transition_clips, transition_durations):
         """
         Crossfades a list of video clips with transition clips in between.
         
-        :param video_clips: List of file paths for main video clips.
+        :param video_clips: List of main clips, as file paths or already loaded moviepy clips.
         :param transition_clips: List of file paths for transition clips.
         :param crossfade_duration: Duration of the crossfade in seconds.
         :return: A final concatenated video clip.
@@ -69,7 +309,9 @@ class VideoGenerator():
         total_time = 0
         for i in range(len(video_clips)):
             
-            current_clip = VideoFileClip(video_clips[i]) # The first clip in the clip,transition,clip group
+            current_clip = video_clips[i] # The first clip in the clip,transition,clip group
+            if isinstance(current_clip, (str, os.PathLike)):
+                current_clip = moviepy.VideoFileClip(current_clip)
             current_clip = current_clip.with_layer_index(0)
 
             # If clip is not the first clip
@@ -82,7 +324,7 @@ class VideoGenerator():
 
             # If there are transitions left
             if i < len(transition_clips):
-                transition_clip = VideoFileClip(transition_clips[i]).with_opacity(0.5) # The transition at the end of the current clip
+                transition_clip = moviepy.VideoFileClip(transition_clips[i]).with_opacity(0.5) # The transition at the end of the current clip
                 transition_clip = transition_clip.with_layer_index(1)
 
                 # Start the first half of the transition as the current clip ends
@@ -94,62 +336,172 @@ class VideoGenerator():
                 composite_clips.append(transition_clip)
 
 
-        composite_video = CompositeVideoClip(clips=composite_clips)
+        composite_video = moviepy.CompositeVideoClip(clips=composite_clips)
         
         #final_video = concatenate_videoclips(clips, method="compose")
         return composite_video
 
+    def render_images_single_pass(self, output_video_file, images, transition_clips, audio_file, subtitle_file, audio_duration, width=1080, height=1920, fps=30):
+        """
+        FFMPEG
+        Render images, transitions, subtitles and audio with one filter_complex and a single encode.
+        Produces the same timeline as create_video_from_images + crossfade_with_moviepy:
+        every image is shown for audio_duration / len(images) seconds and each transition is
+        overlaid at 0.5 opacity, centered on the cut between two images.
+
+        :param output_video_file: Path of the final video
+        :param images: List of image file paths, in display order
+        :param transition_clips: List of transition clip paths to pick from
+        :param audio_file: Narration audio file
+        :param subtitle_file: Subtitles (.srt or .ass) to burn in, or to mux as a track in soft mode
+        :param audio_duration: Length of the narration, which is also the length of the video
+        """
+        self.single_pass_output(output_video_file, images, transition_clips, audio_file, subtitle_file, audio_duration, width, height, fps).run()
+
+        return output_video_file
+
+    def single_pass_output(self, output_video_file, images, transition_clips, audio_file, subtitle_file, audio_duration, width=1080, height=1920, fps=30):
+        """
+        Build the ffmpeg-python output of render_images_single_pass without running it.
+
+        ffmpeg-python merges identical input nodes, so a path used twice (a repeated upload, a transition
+        picked twice) must not become two equal inputs: every image is decoded once, cropped and split,
+        each use loops its single frame, and every transition input is offset to its own start time.
+
+        :return: ffmpeg-python output node, call run() on it
+
+        """
+        num_images = len(images)
+        image_duration = audio_duration / num_images
+        random_transitions = random.choices(transition_clips, k=num_images-1) if transition_clips else []
+
+        # Crop and center every distinct image to width x height once, then split it for each place it is shown
+        uses = {img: images.count(img) for img in images}
+        splits = {}
+        for img, count in uses.items():
+            crop_filter = self.get_crop_filter(img, width, height)
+            cropped = crop_filter(ffmpeg.input(img, framerate=fps)).filter("setsar", 1)
+            splits[img] = iter([cropped] if count == 1 else cropped.split())
+
+        # Each use loops the still frame for its share of the audio
+        image_streams = []
+        for img in images:
+            istream = next(splits[img])
+            image_streams.append(
+                istream
+                .filter("loop", loop=-1, size=1, start=0)
+                .filter("trim", duration=image_duration)
+                .filter("setpts", "PTS-STARTPTS")
+                .filter("fps", fps=fps)
+                .filter("format", "yuv420p")
+            )
+
+        video = ffmpeg.concat(*image_streams, v=1, a=0) if num_images > 1 else image_streams[0]
+
+        # Overlay each transition halfway across the cut, at half opacity. The input offset places the clip and keeps
+        # repeated picks distinct inputs, splitting one input would buffer the frames of every later use in memory
+        placements = []
+        for i, transition in enumerate(random_transitions):
+            transition_duration = self.get_transition_duration(transition)
+            placements.append((transition, max(0, (i + 1) * image_duration - transition_duration / 2)))
+
+        overlays = {}
+        for placement in dict.fromkeys(placements):
+            transition, transition_start = placement
+            overlay_stream = (
+                ffmpeg.input(transition, itsoffset=transition_start).video
+                .filter("format", "rgba")
+                .filter("colorchannelmixer", aa=0.5)
+            )
+            # Same clip at the same start (very short images), these uses run in lockstep so a split is cheap
+            count = placements.count(placement)
+            overlays[placement] = iter([overlay_stream] if count == 1 else overlay_stream.split())
+
+        for placement in placements:
+            video = ffmpeg.overlay(video, next(overlays[placement]), x="(W-w)/2", y="(H-h)/2", eof_action="pass")
+
+        video, subtitle_tracks, subtitle_args = self.subtitle_streams(video, subtitle_file)
+        audio = ffmpeg.input(audio_file).audio
+
+        return (
+            ffmpeg.output(
+                video, audio, *subtitle_tracks, output_video_file,
+                r=fps, audio_bitrate=self.profile.audio_bitrate, t=audio_duration, **self.profile.output_args(self.encode_threads), **subtitle_args
+            )
+            .overwrite_output()
+        )
+
     def create_video_from_images(self, images, transition_clips, audio_duration):
-        final_video_path = os.path.join(tempfile.mkdtemp(), f"stitched_{str(uuid.uuid4())}.mp4")
-        
-        clip_dir = tempfile.mkdtemp()
+        final_video_path = self.workspace.file(".mp4", "stitched_")
+
         num_images = len(images)
         random_transitions = random.choices(transition_clips, k=num_images-1)
-        transition_durations = [self.get_video_duration(clip) for clip in random_transitions]
+        transition_durations = [self.get_transition_duration(clip) for clip in random_transitions]
 
 
         image_duration = audio_duration / num_images
 
-        image_video_clip_paths = []
-        
-        # Crop and center all images to 1080x1920 (9:16)
-        # then turn them into mp4 clips of calculated duration
-        for i, img in enumerate(images):
-            crop_filter = self.get_crop_filter(img, 1080, 1920)
-            output = os.path.join(clip_dir, f"img_clip_{str(uuid.uuid4())}.mp4")
-            #output = f"app/temp/img_clip_{str(uuid.uuid4())}.mp4"
-            istream = ffmpeg.input(img, loop=1, t=image_duration)
+        # Crop and center all images to 1080x1920 (9:16) in memory, several at a time.
+        # Each becomes a still clip of the calculated duration, so nothing is encoded before the composite
+        with self.stage("image_decode"), ThreadPoolExecutor(max_workers=self.clip_workers) as pool:
+            image_clips = list(pool.map(lambda img: self.image_clip(img, image_duration), images))
 
-            crop_filter(istream).filter("fps", fps=30).output(output, vcodec="libx264", pix_fmt="yuv420p", t=image_duration, r=30).run()
-            image_video_clip_paths.append(output)
 
+        with self.stage("composite"):
+            finalRaw = self.crossfade_with_moviepy(image_clips, random_transitions, transition_durations)
+            finalRaw.write_videofile(final_video_path, fps=30, **self.profile.moviepy_args(self.encode_threads))
 
-        finalRaw = self.crossfade_with_moviepy(image_video_clip_paths, random_transitions, transition_durations)
-        finalRaw.write_videofile(final_video_path, codec="libx264", fps=30)
+        return final_video_path
 
-        self.recursive_delete(clip_dir) # Clean the generated clips
+    def image_clip(self, img, image_duration, target_width=1080, target_height=1920):
+        """
+        Decode a single image once, crop and scale it to target size like get_crop_filter does,
+        and wrap the frame in a still clip of image_duration seconds. Runs on a clip worker thread,
+        Pillow releases the GIL while decoding and resizing.
 
-        return final_video_path
+        :return: moviepy ImageClip holding the frame as a NumPy array
+        """
+        with Image.open(img) as image:
+            image = image.convert("RGB")
+            in_width, in_height = image.size
+
+            target_aspect = target_width / target_height
+            if in_width / in_height > target_aspect:
+                crop_width, crop_height = int(in_height * target_aspect), in_height
+            else:
+                crop_width, crop_height = in_width, int(in_width / target_aspect)
+
+            left = (in_width - crop_width) // 2
+            top = (in_height - crop_height) // 2
+            frame = image.resize((target_width, target_height), Image.Resampling.BICUBIC, box=(left, top, left + crop_width, top + crop_height))
+
+        return moviepy.ImageClip(np.asarray(frame), duration=image_duration)
+
+    def get_transition_duration(self, clip):
+        """
+        Duration of a transition clip, from the library manifest when possible
+        """
+        return self.transitions.duration(clip) or self.get_video_duration(clip)
 
     def get_video_duration(self, video_file):
         """
         Get duration of video file
         """
-        try:
-            probe = ffmpeg.probe(video_file, select_streams='v:0')
-            return float(probe["format"]["duration"])
-        except ffmpeg.Error as e:
-            print(f"FFprobe failed for {video_file}: {e.stderr.decode()}")  # Print the exact error
-            raise  # Re-raise the error to see the full traceback
+        with self.stage("probe"):
+            return self.probe.probe(video_file)["duration"]
     
-    def get_audio_duration(self, audio_file):
+    def get_audio_duration(self, audio_file, word_timings=None):
         """
-        Get duration of audio file
+        Get duration of audio file.
+        For tts audio (word_timings given) the duration is known without probing: the output is
+        constant bitrate mp3, so it follows from the file size, and it can't be shorter than the last word.
         """
-        audio_duration = ffmpeg.probe(audio_file, v='error', select_streams='a:0', show_entries='format=duration')
-        audio_duration = float(audio_duration['format']['duration'])
+        if word_timings:
+            size_duration = self.creator.audio_duration_for_size(os.path.getsize(audio_file))
+            return max(size_duration, word_timings[-1][2])
 
-        return audio_duration
+        with self.stage("probe"):
+            return self.probe.probe(audio_file)["duration"]
     
     def get_crop_filter(self, input_file, target_width, target_height):
         """
@@ -157,10 +509,10 @@ class VideoGenerator():
         Can be used directly with `.filter()`.
         """
         # Get input image dimensions
-        probe = ffmpeg.probe(input_file)
-        video_stream = next(stream for stream in probe["streams"] if stream["codec_type"] == "video")
-        in_width = int(video_stream["width"])
-        in_height = int(video_stream["height"])
+        with self.stage("probe"):
+            metadata = self.probe.probe(input_file)
+        in_width = metadata["width"]
+        in_height = metadata["height"]
         
         target_aspect = target_width / target_height
         input_aspect = in_width / in_height
@@ -185,35 +537,6 @@ class VideoGenerator():
 
         return apply_filters  # Return a function that applies the filters
     
-    def create_srt_from_dict(self, word_dict, output_filename):
-        """
-        Generates an SRT file from a dictionary where keys are words and values are tuples 
-        representing (start_time, end_time) in seconds.
-        
-        :param word_dict: Dictionary in the format {word: (start_time, end_time)}.
-        :param output_filename: Name of the output SRT file.
-        """
-        output_filename = 'temp/' + output_filename + '_subtitles.srt'
-        with open(output_filename, 'w', encoding='UTF-8') as file:
-            counter = 1
-            for word_triple in word_dict:
-                word = word_triple[0]
-                start = word_triple[1]
-                end = word_triple[2]
-
-                print(f"{word}: {start}--->{end}")
-
-                # Convert start and end time to the SRT format (HH:MM:SS,MMM)
-                start_time = self.format_time(start)
-                end_time = self.format_time(end)
-
-                # Write each entry in SRT format
-                file.write(f"{counter}\n")
-                file.write(f"{start_time} --> {end_time}\n")
-                file.write(f"{word}\n\n")
-                counter += 1
-
-
     def create_srt_from_dict_timed(self, word_list, words_on_screen=3, spoken_time=0.5):
         """
         Generates an SRT file from a list of words and timings, limit how many words are on screen at once and for how long
@@ -281,12 +604,32 @@ class VideoGenerator():
         return f"{hours:02}:{minutes:02}:{int(seconds):02},{milliseconds:03}"
 
 
+    async def text_to_speech(self, text, voice_id=None):
+        """
+        Narrate text, streaming the audio to a temporary file when stream_tts is enabled
+        and splitting long texts into chunks that are synthesized in parallel
+
+        :return: (audio bytes or audio file path, word timings)
+        """
+        with self.stage("tts"):
+            if self.stream_tts:
+                audio_file = self.workspace.file(".mp3", "narration_")
+                try:
+                    return await self.creator.text_to_speech_timestamps_stream(text, audio_file, voice_id)
+                except Exception:
+                    os.remove(audio_file)
+                    raise
+
+            if self.tts_chunk_chars and len(text) > self.tts_chunk_chars:
+                return await self.creator.text_to_speech_timestamps_chunked(text, voice_id, self.tts_chunk_chars)
+
+            return await self.creator.text_to_speech_timestamps(text, voice_id)
+
     async def generate_subtitles_video(self, text, base_video, output_video, model_id=None):
         """
         Generate a video using a base video and text
         """
-
-        audio_and_timings = await self.creator.text_to_speech_timestamps(text)
+        audio_and_timings = await self.text_to_speech(text, model_id)
         output_video_path = self.add_subtitles_to_video(output_video, audio_and_timings, video_file_path=base_video)
 
         return output_video_path
@@ -295,11 +638,42 @@ class VideoGenerator():
         """
         Generate a video using base images and texts, adding transitions in between
         """
-        audio_and_timings = await self.creator.text_to_speech_timestamps(text, model_id)
+        audio_and_timings = await self.text_to_speech(text, model_id)
         output_video_path = self.add_subtitles_to_video(output_video, audio_and_timings, images=images)
 
         return output_video_path
     
+    async def generate_variants(self, text, variants, model_id=None, max_workers=2):
+        """
+        Render several videos over the same narration. Text to speech, subtitles and the audio
+        duration are computed once, then all variants are rendered concurrently.
+
+        :param variants: List of {"kind": "image" or "video", "files": [...], "output": path}
+        :param max_workers: How many variants are rendered at once
+        :return: List of {"output", "success", "error"}, in the order of variants
+        """
+        audio_and_timings = await self.text_to_speech(text, model_id)
+        audio_file, subtitle_file, audio_duration = self.prepare_narration(audio_and_timings)
+
+        def render(variant):
+            if variant["kind"] == "image":
+                return self.render_narrated_video(variant["output"], audio_file, subtitle_file, audio_duration, images=variant["files"])
+            return self.render_narrated_video(variant["output"], audio_file, subtitle_file, audio_duration, video_file_path=variant["files"][-1])
+
+        try:
+            loop = asyncio.get_running_loop()
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                results = await asyncio.gather(*(loop.run_in_executor(pool, render, variant) for variant in variants), return_exceptions=True)
+
+        finally:
+            self.remove_narration(audio_file, subtitle_file)
+
+        return [
+            {"output": variant["output"], "success": not isinstance(result, Exception), "error": str(result) if isinstance(result, Exception) else None}
+            for variant, result in zip(variants, results)
+        ]
+
+    @staticmethod
     def recursive_delete(folder_path):
         folder = Path(folder_path)
         if folder.exists() and folder.is_dir():
@@ -310,14 +684,15 @@ class VideoGenerator():
                     elif item.is_dir():
                         item.rmdir()  # Only works if the directory is already empty
                 except Exception as e:
-                    print(f"Failed to delete {item}: {e}")
+                    logger.error("Failed to delete %s: %s", item, e)
             try:
                 folder.rmdir()  # Remove the now-empty root folder
             except Exception as e:
-                print(f"Failed to remove directory {folder}: {e}")
+                logger.error("Failed to remove directory %s: %s", folder, e)
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
 
     api_key = os.getenv("elevenlabs_api_key_uofa")
     current_working_dir = os.getcwd()
@@ -338,6 +713,9 @@ if __name__ == "__main__":
     output_video_path = os.path.join(temp_path, output_video_path)
 
     #generate_subtitles_video(text, base_video_path, output_video_path)
-    asyncio.run(generator.generate_subtitles_image(text, "images", output_video_path))
-    #asyncio.run(generator.generate_subtitles_video(text, base_video_path, output_video_path))
+    try:
+        asyncio.run(generator.generate_subtitles_image(text, "images", output_video_path))
+        #asyncio.run(generator.generate_subtitles_video(text, base_video_path, output_video_path))
+    finally:
+        generator.close()
     
@@ -1,29 +1,116 @@
 from dotenv import load_dotenv
 import os
-from elevenlabs.client import ElevenLabs
-from elevenlabs.client import AsyncElevenLabs
-from elevenlabs import play
-import aiohttp
+import numpy as np
+import asyncio
 import base64
-import requests
+import json
+import re
+import logging
+from ttscache import TTSCache
+from lazyimports import LazyObject, lazy
+
+logger = logging.getLogger(__name__)
+
+aiohttp = lazy("aiohttp")
+elevenlabs_client = lazy("elevenlabs.client")
 
 class elevenlabs_calls:
 
-    def __init__(self, api_key):
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, api_key, cache_dir="./temp/tts_cache", cache_max_bytes=512 * 1024 * 1024,
+                 api_base="https://api.elevenlabs.io/v1", max_concurrency=4, max_retries=3, retry_backoff=1.0):
+        """
+        :param api_key: ElevenLabs api key
+        :param cache_dir: Directory of the on disk tts cache, None disables caching
+        :param cache_max_bytes: Size limit of the tts cache before least recently used entries are evicted
+        :param api_base: Base url of the ElevenLabs api
+        :param max_concurrency: Max number of requests in flight at once for this instance. Every render process has
+                                its own, so the account sees up to render processes (on every host) x max_concurrency
+        :param max_retries: How many times a request is retried on 429/5xx responses
+        :param retry_backoff: Initial delay in seconds between retries, doubled after every attempt
+        """
         self.api_key = api_key
-        self.client = ElevenLabs(api_key=self.api_key)
-        self.async_client = AsyncElevenLabs(api_key=self.api_key)
+        # The sdk clients are only built (and the sdk imported) if they are used
+        self.client = LazyObject(lambda: elevenlabs_client.ElevenLabs(api_key=self.api_key))
+        self.async_client = LazyObject(lambda: elevenlabs_client.AsyncElevenLabs(api_key=self.api_key))
         self.output_format = "mp3_44100_128"
         self.model_id="eleven_flash_v2_5" # eleven_multilingual_v2, eleven_flash_v2_5
         self.voice_id="9BWtsMINqrJLrRacOk9x" # default
+        self.voice_settings = {
+            "style" : 0.5,
+            "speed" : 0.9,
+            "use_speaker_boost": 1
+        }
+        self.cache = TTSCache(cache_dir, cache_max_bytes) if cache_dir else None
 
-        self.req_url = f"https://api.elevenlabs.io/v1/text-to-speech/{self.voice_id}/with-timestamps"
+        self.api_base = api_base.rstrip("/")
+        self.req_url = f"{self.api_base}/text-to-speech/{self.voice_id}/with-timestamps"
     
         self.req_headers = {
             "Content-Type": "application/json",
             "xi-api-key": self.api_key,
         }
 
+        # One pooled keep-alive session per instance, created lazily inside the running event loop
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.session = None
+        self.semaphore = None
+        self.session_loop = None
+
+    async def get_session(self):
+        """
+        Return the shared aiohttp session, (re)creating it if it is closed or bound to another event loop.
+        """
+        loop = asyncio.get_running_loop()
+
+        if self.session is None or self.session.closed or self.session_loop is not loop:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60)
+            self.session = aiohttp.ClientSession(connector=connector, headers=self.req_headers)
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+            self.session_loop = loop
+
+        return self.session
+
+    async def close(self):
+        """Close the shared session."""
+        if self.session and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def request(self, method, url, on_success=None, **kwargs):
+        """
+        Send a request through the shared session, retrying with exponential backoff on 429/5xx responses.
+
+        :param on_success: Optional coroutine that consumes a 200 response, used to stream the body
+        Returns:
+            (status, body) where body is the parsed json (or on_success result) on success and the response text otherwise
+        """
+        session = await self.get_session()
+        delay = self.retry_backoff
+
+        for attempt in range(self.max_retries + 1):
+            async with self.semaphore:
+                async with session.request(method, url, **kwargs) as response:
+                    if response.status == 200:
+                        if on_success:
+                            return response.status, await on_success(response)
+                        return response.status, await response.json()
+
+                    body = await response.text()
+                    retry_after = response.headers.get("Retry-After")
+
+            if response.status not in self.RETRY_STATUSES or attempt == self.max_retries:
+                return response.status, body
+
+            # Honour Retry-After when the api sends it, otherwise back off exponentially
+            wait = float(retry_after) if retry_after and retry_after.isdigit() else delay
+            logger.warning("Request to %s returned %s, retrying in %ss", url, response.status, wait)
+            await asyncio.sleep(wait)
+            delay *= 2
+
     def text_to_speech_audio(self, text):
         """
         Returns:
@@ -68,120 +155,273 @@ class elevenlabs_calls:
         if voice_id:
             self.voice_id = voice_id
         
-        print(f"Generating with voice_id: {self.voice_id}")
-        print(f"Endpoint: {self.req_url}")
-        self.req_url = f"https://api.elevenlabs.io/v1/text-to-speech/{self.voice_id}/with-timestamps"
+        logger.info("Generating with voice_id: %s", self.voice_id)
+        logger.debug("Endpoint: %s", self.req_url)
+        self.req_url = f"{self.api_base}/text-to-speech/{self.voice_id}/with-timestamps"
     
+        # Re-renders of the same script reuse the cached audio and skip the request entirely
+        cache_key = None
+        if self.cache:
+            cache_key = self.cache.make_key(text, self.voice_id, self.model_id, self.voice_settings)
+            cached = self.cache.get(cache_key)
+            if cached:
+                logger.info("TTS cache hit: %s", cache_key)
+                return cached
+
         payload = {
             "text": text,
             "model_id": self.model_id,
-            "voice_settings": {
-                "style" : 0.5,
-                "speed" : 0.9,
-                "use_speaker_boost": 1           
-            }
+            "voice_settings": self.voice_settings
         }
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(self.req_url, json=payload, headers=self.req_headers) as response:
-                if response.status == 200:
-                    # Parse JSON response
-                    response_json = await response.json()
-                    
-                    # Extract base64 audio data
-                    audio_base64 = response_json.get("audio_base64")
-                    if not audio_base64:
-                        print("Error: No audio data found in response.")
-                        return
-
-                    # Decode and save the audio file
-                    audio_bytes = base64.b64decode(audio_base64)
-
-                    # Enable to store audio instead of returning byte data
-
-                    # with open(output_filename, "wb") as f: # change output file name to be unique to build db
-                    #     f.write(audio_bytes)
-                    # print(f"Audio saved at {output_file_path}")
-
-                    # Extract character timings
-                    word_timing_map = self.extract_character_timings(text, response_json)
-                    
-                    
-                    # print("Characters:", response_json.get("alignment", {}).get("characters"), len(response_json.get("alignment", {}).get("characters")))
-                    # start_times = response_json.get("alignment", {}).get("character_start_times_seconds")
-                    # end_times = response_json.get("alignment", {}).get("character_end_times_seconds")
-                    # print("Start times:", start_times, len(start_times))
-                    # print("Start times:", end_times, len(end_times))
-                    # print("Character Timings:", word_timing_map)
-
-                else:
-                    error_message = await response.text()
-                    print(f"Error: {response.status}, {error_message}")
+        status, response_json = await self.request("POST", self.req_url, json=payload)
 
+        if status != 200:
+            logger.error("ElevenLabs error: %s, %s", status, response_json)
+            raise RuntimeError(f"ElevenLabs request failed with status {status}")
+
+        # Extract base64 audio data
+        audio_base64 = response_json.get("audio_base64")
+        if not audio_base64:
+            logger.error("No audio data found in response.")
+            return
+
+        # Decode and save the audio file
+        audio_bytes = base64.b64decode(audio_base64)
+
+        # Enable to store audio instead of returning byte data
+
+        # with open(output_filename, "wb") as f: # change output file name to be unique to build db
+        #     f.write(audio_bytes)
+        # print(f"Audio saved at {output_file_path}")
+
+        # Extract character timings
+        word_timing_map = self.extract_character_timings(text, response_json)
+
+        if cache_key:
+            self.cache.put(cache_key, audio_bytes, word_timing_map)
 
         return (audio_bytes, word_timing_map)
 
 
-    def extract_character_timings(self, text, response_json):
+    async def text_to_speech_timestamps_stream(self, text, output_path, voice_id=None):
+        """
+        Streaming variant of text_to_speech_timestamps.
+        Audio chunks are decoded straight into output_path as they arrive and the alignment is
+        built up chunk by chunk, so the full base64 response is never held in memory.
 
-        alignment = response_json.get("alignment", {})
+        Returns:
+            (output_path, word_timing_map)
+        """
+        if voice_id:
+            self.voice_id = voice_id
+
+        cache_key = None
+        if self.cache:
+            cache_key = self.cache.make_key(text, self.voice_id, self.model_id, self.voice_settings)
+            cached = self.cache.get(cache_key)
+            if cached:
+                logger.info("TTS cache hit: %s", cache_key)
+                with open(output_path, "wb") as f:
+                    f.write(cached[0])
+                return (output_path, cached[1])
+
+        stream_url = f"{self.api_base}/text-to-speech/{self.voice_id}/stream/with-timestamps"
+        logger.info("Generating with voice_id: %s", self.voice_id)
+        logger.debug("Endpoint: %s", stream_url)
+
+        payload = {
+            "text": text,
+            "model_id": self.model_id,
+            "voice_settings": self.voice_settings
+        }
+
+        alignment = {
+            "characters": [],
+            "character_start_times_seconds": [],
+            "character_end_times_seconds": [],
+        }
+
+        def handle_chunk(audio_file, line):
+            chunk = json.loads(line)
 
-        characters = alignment.get("characters", []) # List of all character in the word
-        start_times = alignment.get("character_start_times_seconds", [])
-        end_times = alignment.get("character_end_times_seconds", [])
+            audio_base64 = chunk.get("audio_base64")
+            if audio_base64:
+                audio_file.write(base64.b64decode(audio_base64))
 
-        words = text.split()  # Split text into words
+            chunk_alignment = chunk.get("alignment") or {}
+            for field in alignment:
+                alignment[field].extend(chunk_alignment.get(field, []))
+
+        async def read_stream(response):
+            # The endpoint sends one json object per line, each with an audio chunk and its alignment
+            buffer = b""
+            with open(output_path, "wb") as audio_file:
+                async for data in response.content.iter_chunked(64 * 1024):
+                    buffer += data
+                    *lines, buffer = buffer.split(b"\n")
+                    for line in lines:
+                        if line.strip():
+                            handle_chunk(audio_file, line)
+
+                if buffer.strip():
+                    handle_chunk(audio_file, buffer)
+
+        status, body = await self.request("POST", stream_url, on_success=read_stream, json=payload)
+
+        if status != 200:
+            logger.error("ElevenLabs error: %s, %s", status, body)
+            raise RuntimeError(f"ElevenLabs request failed with status {status}")
+
+        word_timing_map = self.extract_character_timings(text, {"alignment": alignment})
+
+        if cache_key:
+            with open(output_path, "rb") as f:
+                self.cache.put(cache_key, f.read(), word_timing_map)
+
+        return (output_path, word_timing_map)
+
+
+    def split_sentences(self, text, max_chars=1000):
+        """
+        Split text at sentence boundaries (., !, ?, and the Devanagari danda) into chunks of at most
+        max_chars characters. A single sentence longer than max_chars becomes its own chunk.
+        """
+        sentences = [sentence for sentence in re.split(r"(?<=[.!?।॥])\s+", text.strip()) if sentence]
+
+        chunks = []
+        current = ""
+        for sentence in sentences:
+            if current and len(current) + 1 + len(sentence) > max_chars:
+                chunks.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}" if current else sentence
+
+        if current:
+            chunks.append(current)
+
+        return chunks
+
+    def audio_duration(self, audio_bytes):
+        """
+        Duration of constant bitrate mp3 audio in the configured output format, computed from its size.
+        """
+        return self.audio_duration_for_size(len(audio_bytes))
+
+    def audio_duration_for_size(self, num_bytes):
+        """
+        Duration of num_bytes of constant bitrate mp3 audio in the configured output format.
+        """
+        bitrate_kbps = int(self.output_format.split("_")[-1])
+        return num_bytes * 8 / (bitrate_kbps * 1000)
+
+    async def text_to_speech_timestamps_chunked(self, text, voice_id=None, max_chars=1000):
+        """
+        Synthesize long text as sentence aligned chunks in parallel and stitch the results.
+        Each chunk's word timings are shifted by the length of the audio before it, so the
+        result is one continuous timing list, same as text_to_speech_timestamps.
+
+        Returns:
+            (audio_bytes, word_timing_map)
+        """
+        if voice_id:
+            self.voice_id = voice_id
+
+        chunks = self.split_sentences(text, max_chars)
+        if len(chunks) <= 1:
+            return await self.text_to_speech_timestamps(text)
+
+        logger.info("Generating %d chunks in parallel", len(chunks))
+
+        # Concurrency is capped by the shared session's semaphore
+        results = await asyncio.gather(*(self.text_to_speech_timestamps(chunk) for chunk in chunks))
+
+        audio_parts = []
         word_timing_map = []
-        char_index = 0
+        offset = 0.0
 
-        for word in words:
-            print("Word:", word)
+        for audio_bytes, chunk_timings in results:
+            audio_parts.append(audio_bytes)
+            word_timing_map.extend((word, start + offset, end + offset) for word, start, end in chunk_timings)
+            offset += self.audio_duration(audio_bytes)
 
-            word_start = None
-            word_end = None
+        return (b"".join(audio_parts), word_timing_map)
 
-            while characters[char_index] == ' ': # Skip all spaces
-                char_index += 1
 
-            if word[0] == characters[char_index]:
-                print(char_index, characters[char_index])
+    def extract_character_timings(self, text, response_json):
+        """
+        Group the per character alignment into word timings.
 
-                word_start = start_times[char_index] # Word start time set when first char is in characters list
-                char_index = char_index + (len(word)-1) # Move to the end of the word
-                word_end = end_times[char_index] # Word end time set when last char in in characters list
+        Word boundaries come from the whitespace in the aligned characters rather than from
+        len(word), so multi codepoint graphemes (Devanagari matras, combining marks) and extra
+        spaces can't shift the alignment or drop words.
 
-                word_timing_map.append((word, word_start, word_end))
-            
-                char_index += 1 # Move to the next character
+        Returns:
+            List in the format [(word, start_time, end_time), ...]
+        """
+        alignment = response_json.get("alignment", {})
 
-        print(word_timing_map)
-        
-        return word_timing_map
+        characters = np.array(alignment.get("characters", []), dtype=object) # List of all character in the word
+        start_times = np.asarray(alignment.get("character_start_times_seconds", []), dtype=np.float64)
+        end_times = np.asarray(alignment.get("character_end_times_seconds", []), dtype=np.float64)
 
-    
-    def get_models(self):
+        if characters.size == 0:
+            return []
+
+        # Mark every non whitespace character, a word is a run of marked characters
+        in_word = ~np.char.isspace(characters.astype(str))
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], in_word.view(np.int8), [0]))))
+        first_chars = edges[0::2]
+        last_chars = edges[1::2] - 1
+
+        if first_chars.size == 0:
+            return []
+
+        word_starts = start_times[first_chars]
+        word_ends = end_times[last_chars]
+
+        words = text.split()
+        if len(words) != len(first_chars):
+            # Text and alignment disagree (normalized characters, punctuation spacing),
+            # rebuild the words from the aligned characters so none are lost
+            word_chars = characters[in_word]
+            word_offsets = np.concatenate(([0], np.cumsum(last_chars - first_chars + 1)[:-1]))
+            words = np.add.reduceat(word_chars, word_offsets).tolist()
+
+        return list(zip(words, word_starts.tolist(), word_ends.tolist()))
+
+
+    async def get_models(self):
         """Get list of models"""
-        url = "https://api.elevenlabs.io/v1/models"
-        response = requests.get(url, headers=self.req_headers)
+        url = f"{self.api_base}/models"
+        status, response_json = await self.request("GET", url)
 
-        print(response.json())
+        logger.info("%s", response_json)
+        return response_json
 
         
-    def get_voice_list(self):
+    async def get_voice_list(self):
         """
         Get list of voices and their ids
         """
 
-        url = "https://api.elevenlabs.io/v1/voices"
-        response = requests.get(url, headers=self.req_headers)
+        url = f"{self.api_base}/voices"
+        status, response_json = await self.request("GET", url)
 
-        print(response.json())
+        logger.info("%s", response_json)
+        return response_json
 
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     load_dotenv()
     api_key = os.getenv("ELEVENLABS_API_KEY_3")
     elevenlabs_object = elevenlabs_calls(api_key)
 
-    elevenlabs_object.get_voice_list()
\ No newline at end of file
+    async def list_voices():
+        await elevenlabs_object.get_voice_list()
+        await elevenlabs_object.close()
+
+    asyncio.run(list_voices())
\ No newline at end of file
@@ -0,0 +1,81 @@
+DEFAULT_PROFILE = "standard"
+
+# Quality/speed trade-offs for every x264 encode, config.yaml's encode_profiles can override or add to these
+DEFAULT_PROFILES = {
+    "draft": {"crf": 28, "preset": "ultrafast", "tune": "fastdecode", "gop": 60},
+    "standard": {"crf": 23, "preset": "veryfast", "tune": None, "gop": 60},
+    "final": {"crf": 18, "preset": "slow", "tune": None, "gop": 60},
+}
+
+
+class EncodeProfile:
+    """
+    Named libx264 settings shared by the ffmpeg outputs and moviepy's write_videofile.
+    """
+
+    def __init__(self, name, crf=23, preset="medium", tune=None, gop=None, faststart=True, audio_bitrate="192k"):
+        """
+        :param crf: Constant rate factor, lower is better quality and bigger files
+        :param preset: x264 preset, slower presets compress better at the same crf
+        :param tune: Optional x264 tune (film, animation, fastdecode, ...)
+        :param gop: Max frames between keyframes, None leaves it to x264
+        :param faststart: Move the moov atom to the front of final outputs so they can play while downloading
+        :param audio_bitrate: Bitrate of the narration audio
+        """
+        self.name = name
+        self.crf = crf
+        self.preset = preset
+        self.tune = tune
+        self.gop = gop
+        self.faststart = faststart
+        self.audio_bitrate = audio_bitrate
+
+    def output_args(self, threads=None, final=True):
+        """
+        Keyword arguments for an ffmpeg-python output.
+
+        :param threads: Limit the encoder to this many threads, None lets ffmpeg decide
+        :param final: Whether this is a delivered file, intermediates skip faststart's extra pass over the file
+        """
+        args = {"vcodec": "libx264", "pix_fmt": "yuv420p", "crf": self.crf, "preset": self.preset}
+        if self.tune:
+            args["tune"] = self.tune
+        if self.gop:
+            args["g"] = self.gop
+        if threads:
+            args["threads"] = threads
+
+        return {**args, **self.mux_args(final)}
+
+    def mux_args(self, final=True):
+        """Keyword arguments for an ffmpeg-python output that stream copies the video instead of encoding it."""
+        return {"movflags": "+faststart"} if final and self.faststart else {}
+
+    def moviepy_args(self, threads=None, final=False):
+        """Keyword arguments for moviepy's write_videofile."""
+        ffmpeg_params = ["-crf", str(self.crf), "-pix_fmt", "yuv420p"]
+        if self.tune:
+            ffmpeg_params += ["-tune", self.tune]
+        if self.gop:
+            ffmpeg_params += ["-g", str(self.gop)]
+        if final and self.faststart:
+            ffmpeg_params += ["-movflags", "+faststart"]
+
+        return {"codec": "libx264", "preset": self.preset, "threads": threads, "ffmpeg_params": ffmpeg_params}
+
+    def __repr__(self):
+        return f"EncodeProfile({self.name!r}, crf={self.crf}, preset={self.preset!r})"
+
+
+def load_profiles(overrides=None):
+    """
+    Build the encode profiles, overrides is the encode_profiles section of config.yaml:
+    {name: {crf, preset, tune, gop, faststart, audio_bitrate}}, missing settings keep their defaults.
+
+    :return: Dict of name -> EncodeProfile
+    """
+    settings = {name: dict(values) for name, values in DEFAULT_PROFILES.items()}
+    for name, values in (overrides or {}).items():
+        settings.setdefault(name, {}).update(values or {})
+
+    return {name: EncodeProfile(name, **values) for name, values in settings.items()}
@@ -0,0 +1,128 @@
+"""
+Local stand in for the RunwayML api, serving the endpoints RunwayTaskManager uses: creating an image to
+video task, retrieving it and downloading its output. Tasks move from PENDING through RUNNING to
+SUCCEEDED (or FAILED) as they are polled, so the whole submit, poll, download flow runs without a key.
+
+Point the app at it with runway_base_url in config.yaml:
+
+    python fakerunway.py --port 8100 --video sample.mp4
+    runway_base_url: http://127.0.0.1:8100
+"""
+import argparse
+import time
+import uuid
+from datetime import datetime, timezone
+from aiohttp import web
+from fakeserver import ThreadedServer
+
+
+class FakeRunwayServer(ThreadedServer):
+    """
+    Every task finishes after polls_to_finish retrievals. Tasks whose prompt text is in fail_prompts fail
+    instead of succeeding. Successful tasks output one url serving the configured video bytes.
+    """
+
+    def __init__(self, video=b"fake runway video", polls_to_finish=2, fail_prompts=(), host="127.0.0.1", port=0):
+        """
+        :param video: Bytes served as every task's output
+        :param polls_to_finish: Retrievals until a task reaches its final status
+        :param fail_prompts: Prompt texts whose tasks fail
+        """
+        super().__init__(host, port)
+        self.video = video
+        self.polls_to_finish = polls_to_finish
+        self.fail_prompts = set(fail_prompts)
+        self.tasks = {}
+        self.requests = {"create": 0, "retrieve": 0, "download": 0}
+
+    def task_json(self, task):
+        body = {"id": task["id"], "createdAt": task["created"], "status": task["status"]}
+        if task["status"] == "RUNNING":
+            body["progress"] = task["polls"] / self.polls_to_finish
+        elif task["status"] == "SUCCEEDED":
+            body["output"] = [f"{self.base_url}/outputs/{task['id']}.mp4"]
+        elif task["status"] == "FAILED":
+            body["failure"] = "The fake server was asked to fail this task."
+            body["failureCode"] = "INTERNAL.TEST"
+        return body
+
+    async def create(self, request):
+        self.requests["create"] += 1
+        payload = await request.json()
+        if not payload.get("model") or not payload.get("promptImage"):
+            return web.json_response({"error": "model and promptImage are required"}, status=400)
+
+        task_id = str(uuid.uuid4())
+        self.tasks[task_id] = {
+            "id": task_id,
+            "created": datetime.now(timezone.utc).isoformat(),
+            "status": "PENDING",
+            "prompt": payload.get("promptText"),
+            "polls": 0,
+        }
+        return web.json_response({"id": task_id})
+
+    async def retrieve(self, request):
+        self.requests["retrieve"] += 1
+        task = self.tasks.get(request.match_info["task_id"])
+        if task is None:
+            return web.json_response({"error": "Task not found"}, status=404)
+
+        if task["status"] in ("PENDING", "RUNNING"):
+            task["polls"] += 1
+            if task["polls"] >= self.polls_to_finish:
+                task["status"] = "FAILED" if task["prompt"] in self.fail_prompts else "SUCCEEDED"
+            else:
+                task["status"] = "RUNNING"
+
+        return web.json_response(self.task_json(task))
+
+    async def delete(self, request):
+        task = self.tasks.get(request.match_info["task_id"])
+        if task is None:
+            return web.json_response({"error": "Task not found"}, status=404)
+
+        task["status"] = "CANCELLED"
+        return web.Response(status=204)
+
+    async def download(self, request):
+        self.requests["download"] += 1
+        task = self.tasks.get(request.match_info["task_id"])
+        if task is None or task["status"] != "SUCCEEDED":
+            return web.Response(status=404)
+
+        return web.Response(body=self.video, content_type="video/mp4")
+
+    def application(self):
+        app = web.Application()
+        app.router.add_post("/v1/image_to_video", self.create)
+        app.router.add_get("/v1/tasks/{task_id}", self.retrieve)
+        app.router.add_delete("/v1/tasks/{task_id}", self.delete)
+        app.router.add_get("/outputs/{task_id}.mp4", self.download)
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--video", default=None, help="mp4 served as every task's output")
+    parser.add_argument("--polls-to-finish", type=int, default=3, help="Status checks until a task finishes")
+    args = parser.parse_args()
+
+    video = b"fake runway video"
+    if args.video:
+        with open(args.video, "rb") as f:
+            video = f.read()
+
+    server = FakeRunwayServer(video, polls_to_finish=args.polls_to_finish, port=args.port).start()
+    print(f"Fake RunwayML api on {server.base_url}")
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
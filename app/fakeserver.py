@@ -0,0 +1,70 @@
+"""
+Base for the local stand ins of external apis (fakerunway.py, benchmark.py's ElevenLabs server):
+an aiohttp app served on a background thread with its own event loop, so blocking sdk clients and
+other event loops can call it.
+"""
+import asyncio
+import socket
+import threading
+from aiohttp import web
+
+
+class ThreadedServer:
+    """
+    Subclasses add their routes in application(). port=0 binds a free port, read it from port or
+    base_url once start() returns.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self.loop = None
+        self.runner = None
+        self.thread = None
+        self.error = None
+        self.started = threading.Event()
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def application(self):
+        """:return: The aiohttp web.Application to serve"""
+        raise NotImplementedError
+
+    def start(self):
+        """Serve on a background thread with its own event loop."""
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+        self.started.wait()
+        if self.error:
+            raise self.error
+
+        return self
+
+    def serve(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+        try:
+            # Bind the socket here so the port is known without reaching into the site's server
+            sock = socket.create_server((self.host, self.port))
+            self.port = sock.getsockname()[1]
+            self.runner = web.AppRunner(self.application())
+            self.loop.run_until_complete(self.runner.setup())
+            self.loop.run_until_complete(web.SockSite(self.runner, sock).start())
+        except Exception as e:
+            self.error = e
+            self.started.set()
+            self.loop.close()
+            return
+
+        self.started.set()
+        self.loop.run_forever()
+        self.loop.close()
+
+    def stop(self):
+        if self.runner and not self.error:
+            asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
@@ -107,15 +107,17 @@ function FileTextCall({ apiEndpoint, supportedFileTypes, model_id }) {
                 throw new Error("Upload failed. Please try again.");
             }
 
-            setSuccess("Upload successful!");
+            setSuccess("Upload successful! Rendering...");
 
-            const responseData = await response.blob();
-            const videoURL = URL.createObjectURL(responseData)
-            if (videoURL) {
-                setreturnedVideo(videoURL); // Set the returned video URL
-                setSuccess("Upload successful!");
+            // Renders run as background jobs, poll until this one finishes
+            const { job_id } = await response.json();
+            const job = await waitForJob(job_id);
+
+            if (job.status === "succeeded") {
+                setreturnedVideo(job.video_url); // Streamed with range requests, kept on the server for a while
+                setSuccess("Render finished!");
             } else {
-                setError("Video URL not found in response.");
+                setError(`Render ${job.status}${job.error ? `: ${job.error}` : ""}`);
             }
 
         } catch (error) {
@@ -125,6 +127,22 @@ function FileTextCall({ apiEndpoint, supportedFileTypes, model_id }) {
         }
     };
 
+    const waitForJob = async (jobId) => {
+        while (true) {
+            const response = await fetch(`/jobs/${jobId}`);
+            if (!response.ok) {
+                throw new Error("Could not get render status.");
+            }
+
+            const job = await response.json();
+            if (["succeeded", "failed", "cancelled"].includes(job.status)) {
+                return job;
+            }
+
+            await new Promise((resolve) => setTimeout(resolve, 2000));
+        }
+    };
+
     const moveFileUp = (index) => {
         if (index > 0) {
             const updatedFiles = [...selectedFiles];
@@ -196,7 +214,7 @@ function FileTextCall({ apiEndpoint, supportedFileTypes, model_id }) {
             {returnedVideo && (
                 <Box key={returnedVideo} sx={{ display: "flex", flexDirection: "column", alignItems: "center", justifyContent: "center", maxWidth: "200px", maxHeight:"500px", border: "1px solid #ccc", padding: "10px", borderRadius: "4px" }}>
                     <Typography variant="h6" gutterBottom>Generated Video</Typography>
-                    <video width="100%" height="auto" controls>
+                    <video width="100%" height="auto" controls preload="metadata">
                         <source src={returnedVideo} type="video/mp4" />
                         Your browser does not support the video tag.
                     </video>
@@ -153,16 +153,26 @@ function MainComponent() {
 
     const formData = new FormData();
     formData.append('text', subtitlesText);
-    formData.append('base_video', baseVideoFile);
+    formData.append('files', baseVideoFile);
+    formData.append('model_id', selectedVoice);
 
     try {
       const response = await axios.post('/generate_video', formData, {
-        responseType: 'blob',
         headers: { 'Content-Type': 'multipart/form-data' }
       });
 
-      const processedVideoUrl = URL.createObjectURL(response.data);
-      setProcessedVideoPreview(processedVideoUrl);
+      // Poll the render job, then let the video element stream the result instead of downloading it whole
+      const jobId = response.data.job_id;
+      let job;
+      do {
+        await new Promise((resolve) => setTimeout(resolve, 2000));
+        job = (await axios.get(`/jobs/${jobId}`)).data;
+      } while (!['succeeded', 'failed', 'cancelled'].includes(job.status));
+
+      if (job.status !== 'succeeded') {
+        throw new Error(job.error || `Render ${job.status}`);
+      }
+      setProcessedVideoPreview(job.video_url);
     } catch (error) {
       console.error('Error uploading files:', error);
       alert("There was an error processing your video.");
@@ -1,27 +1,111 @@
-from instabot import Bot
 import os
+import logging
+import threading
 from dotenv import load_dotenv
 import asyncio
+from lazyimports import lazy
+
+instabot = lazy("instabot")
 
 class Instagram:
-    def __init__(self, accounts):
+    def __init__(self, accounts, session_folder="./instagram_sessions", max_workers=4, max_retries=2, retry_delay=5):
         """
         Initialize Instagram bot with multiple accounts.
+
+        :param accounts: List of {"username": ..., "password": ...}
+        :param session_folder: Where each account's cookie cache is persisted between posts and restarts
+        :param max_workers: Max number of accounts uploading at once
+        :param max_retries: How many times a failed upload is retried for the same account
+        :param retry_delay: Seconds to wait before retrying, doubled after every attempt
         """
         load_dotenv()
         self.accounts = accounts
+        self.session_folder = session_folder
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+        # Logged in bots are kept and reused, instabot is not thread safe so each account has its own lock
+        self.bots = {}
+        self.bot_locks = {account['username']: threading.Lock() for account in accounts}
+        self.semaphore = None
 
-    async def post_to_instagram(self, video_path, caption: str, tags=""):
+    async def post_to_instagram(self, video_path, caption: str, tags="", usernames=None):
         """
-        Post a video to all Instagram accounts asynchronously.
+        Post a video to all Instagram accounts (or only to usernames) with a bounded number of uploads at once.
+        Every account is retried on its own, so accounts that already succeeded are never posted to twice.
+
+        :return: List of {"username", "success", "attempts", "error"}, one per account
+        :raises ValueError: If usernames is empty or names an account that is not configured
         """
-        await asyncio.gather(*(asyncio.to_thread(self.post_video, account, video_path, caption, tags) for account in self.accounts))
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_workers)
+
+        if usernames is not None:
+            configured = {account['username'] for account in self.accounts}
+            unknown = [username for username in usernames if username not in configured]
+            if unknown:
+                raise ValueError(f"Unknown instagram accounts: {', '.join(unknown)}")
+            if not usernames:
+                raise ValueError("No instagram accounts given")
+
+        accounts = [account for account in self.accounts if usernames is None or account['username'] in usernames]
+        return await asyncio.gather(*(self.post_with_retries(account, video_path, caption, tags) for account in accounts))
+
+    async def post_with_retries(self, account, video_path, caption, tags):
+        """Upload to one account, retrying with backoff on failure."""
+        delay = self.retry_delay
+        error = None
+
+        for attempt in range(1, self.max_retries + 2):
+            async with self.semaphore:
+                try:
+                    if await asyncio.to_thread(self.post_video, account, video_path, caption, tags):
+                        return {"username": account['username'], "success": True, "attempts": attempt, "error": None}
+                    error = "Upload rejected"
+                except Exception as e:
+                    logging.error(f"Error posting to {account['username']}: {e}", exc_info=True)
+                    error = str(e)
+
+            if attempt <= self.max_retries:
+                await asyncio.sleep(delay)
+                delay *= 2
+
+        return {"username": account['username'], "success": False, "attempts": self.max_retries + 1, "error": error}
+
+    def get_bot(self, account):
+        """
+        Return a logged in bot for the account, reusing the cached session and cookie file when possible.
+        """
+        username = account['username']
+        bot = self.bots.get(username)
+
+        if bot is None:
+            bot = instabot.Bot(base_path=os.path.join(self.session_folder, username))
+            if not bot.login(username=username, password=account['password'], use_cookie=True, is_threaded=True):
+                # Not cached, the next attempt logs in again
+                raise RuntimeError(f"Login failed for {username}")
+            self.bots[username] = bot
+
+        return bot
 
     def post_video(self, account, video_path, caption, tags):
         """
-        Logs into an account and posts a video.
+        Posts a video with the account's persisted session.
+
+        :return: True if the upload succeeded
         """
-        bot = Bot()
-        bot.login(username=account['username'], password=account['password'])
-        bot.upload_video(video_path, caption=caption, tags=tags)
-        bot.logout()
\ No newline at end of file
+        with self.bot_locks[account['username']]:
+            bot = self.get_bot(account)
+
+            try:
+                result = bot.upload_video(video_path, caption=caption, tags=tags)
+            except Exception:
+                # Log in again on the next attempt in case the session went stale
+                self.bots.pop(account['username'], None)
+                raise
+
+            if not result:
+                self.bots.pop(account['username'], None)
+
+            return bool(result)
@@ -0,0 +1,387 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import zipfile
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from editvideo import VideoGenerator
+from elevenapi import elevenlabs_calls
+from mediaprobe import media_probe
+from workspace import Workspace
+from encodeprofiles import DEFAULT_PROFILE
+import lazyimports
+import metrics
+from broker import CANCELLED, FAILED, QUEUED, RUNNING, SUCCEEDED
+
+logger = logging.getLogger(__name__)
+
+
+def configure_worker_logging(level=logging.INFO):
+    """Spawned workers (macOS, Windows) don't inherit the app's logging setup."""
+    logging.basicConfig(level=level, format="%(asctime)s %(processName)s %(name)s %(levelname)s %(message)s")
+
+
+# Render process state that outlives single jobs: the tts client, so its keep-alive connections and its
+# request cap are shared by every job of the process, and the event loop its session is bound to
+tts_client = None
+render_loop = None
+
+
+def get_tts_client(api_key, tts_options=None):
+    """The render process's tts client, built on first use."""
+    global tts_client
+    if tts_client is None or tts_client.api_key != api_key:
+        tts_client = elevenlabs_calls(api_key, **(tts_options or {}))
+
+    return tts_client
+
+
+def run_in_render_loop(coro):
+    """
+    Run a job on the render process's event loop. Unlike asyncio.run the loop is kept for the next job,
+    so the tts session stays open, tasks the job left behind are cancelled like asyncio.run would.
+    """
+    global render_loop
+    if render_loop is None:
+        render_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(render_loop)
+
+    try:
+        return render_loop.run_until_complete(coro)
+    finally:
+        leftovers = [task for task in asyncio.all_tasks(render_loop) if not task.done()]
+        for task in leftovers:
+            task.cancel()
+        if leftovers:
+            render_loop.run_until_complete(asyncio.gather(*leftovers, return_exceptions=True))
+
+
+def init_worker(warm_up_modules=(), api_key=None, tts_options=None):
+    """
+    Process pool initializer: set up logging, build the process's tts client and optionally preload the
+    heavy render dependencies, so a worker's first job doesn't pay for the imports.
+    """
+    configure_worker_logging()
+    if api_key is not None:
+        get_tts_client(api_key, tts_options)
+    if warm_up_modules:
+        timings = lazyimports.warm_up(warm_up_modules)
+        logger.info("Render worker warmed up: %s", ", ".join(f"{name} {seconds:.3f}s" for name, seconds in timings.items()))
+
+
+def worker_ready():
+    """No-op submitted at start so the pool spawns (and warms up) its workers before the first job."""
+    return os.getpid()
+
+
+def render_job(api_key, kind, params, generator_options=None, job_id=None, work_folder="./temp/work"):
+    """
+    Entry point executed inside a render worker process.
+    Builds its own VideoGenerator so nothing unpicklable crosses the process boundary, the tts client is
+    the process's own and reused across jobs.
+
+    :param api_key: ElevenLabs api key
+    :param kind: "image", "video" or "batch", decides which pipeline is used
+    :param params: Job parameters as stored in the broker
+    :param generator_options: Extra VideoGenerator keyword arguments from the app config
+    :param job_id: Attached to the worker's log lines, also names the job's workspace
+    :param work_folder: Where the job's workspace for intermediate files is created
+    :return: (path of the rendered video, report) where the report carries the job's stage timings,
+             output size and cache counters back to the app process for its metrics
+    """
+    generator_options = dict(generator_options or {})
+    for option in ("engine", "subtitle_mode", "encode_profile"):
+        if params.get(option):
+            generator_options[option] = params[option]
+
+    workspace = Workspace(work_folder, job_id)
+    tts = get_tts_client(api_key, generator_options.pop("tts_options", None))
+    generator = VideoGenerator(api_key, workspace=workspace, tts_client=tts, **generator_options)
+    generator.job_id = job_id
+    probe_stats = media_probe.stats()
+    tts_stats = tts.cache.stats() if tts.cache else None
+    start = time.perf_counter()
+
+    async def run():
+        if kind == "image":
+            return await generator.generate_subtitles_image(params["text"], params["files"], params["output"], params.get("model_id"))
+
+        elif kind == "video":
+            return await generator.generate_subtitles_video(params["text"], params["files"][-1], params["output"], params.get("model_id"))
+
+        elif kind == "batch":
+            results = await generator.generate_variants(params["text"], params["variants"], params.get("model_id"), params.get("variant_workers", 2))
+            return zip_variants(params["output"], results)
+
+        raise ValueError(f"Unknown job kind: {kind}")
+
+    try:
+        result = run_in_render_loop(run())
+    finally:
+        workspace.close()
+
+    # The counters are the process's, report this job's share
+    caches = {"probe": counter_delta(probe_stats, media_probe.stats())}
+    if tts_stats:
+        caches["tts"] = counter_delta(tts_stats, tts.cache.stats())
+
+    report = {
+        "seconds": time.perf_counter() - start,
+        "stages": generator.stage_timings,
+        "output_bytes": os.path.getsize(result) if os.path.exists(result) else 0,
+        "caches": caches,
+    }
+
+    return result, report
+
+
+def counter_delta(before, after):
+    return {"hits": after["hits"] - before["hits"], "misses": after["misses"] - before["misses"]}
+
+
+def zip_variants(zip_path, results):
+    """
+    Pack the rendered variants and a manifest of their outcomes into one zip, removing the loose videos.
+
+    :return: Path of the zip
+    """
+    manifest = []
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_STORED) as archive: # mp4s are already compressed
+        for i, result in enumerate(results):
+            name = f"variant_{i}.mp4" if result["success"] else None
+            if name:
+                archive.write(result["output"], name)
+            if os.path.exists(result["output"]):
+                os.remove(result["output"]) # Failed variants can leave a partial file behind
+            manifest.append({"variant": i, "file": name, "success": result["success"], "error": result["error"]})
+
+        archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+
+    if not any(result["success"] for result in results):
+        raise RuntimeError("Every variant failed to render")
+
+    return zip_path
+
+
+def generator_options_from_config(config):
+    """VideoGenerator keyword arguments for the render workers, from config.yaml."""
+    return {
+        "encode_profile": config.get("encode_profile", DEFAULT_PROFILE),
+        "encode_profiles": config.get("encode_profiles"),
+        **config.get("video_generator", {}),
+    }
+
+
+class JobQueue:
+    """
+    Runs render jobs in a bounded process pool so the event loop is never blocked by ffmpeg/moviepy.
+    Jobs go through a broker, so the api process can render them itself (max_workers > 0) or leave
+    them to standalone workers (worker.py) on this or other hosts. Broker calls are blocking (sqlite,
+    network round trips to redis) and run in threads, except from active_paths, which the reapers call
+    from their sweep thread.
+    """
+
+    def __init__(self, api_key, broker, max_workers=2, generator_options=None, work_folder="./temp/work", warm_up=False, lease=60, max_crashes=2):
+        """
+        :param broker: Broker the jobs are queued in, see broker.py
+        :param max_workers: Render processes of this queue, 0 only submits and tracks jobs. The cores are split
+                            between them unless generator_options sets encode_threads
+        :param work_folder: Folder for the per job workspaces of intermediate files
+        :param warm_up: Spawn the workers at start and preload moviepy and the tts clients in them
+        :param lease: Seconds without a heartbeat after which a running job is considered abandoned and requeued
+        :param max_crashes: Times a job may take down its render process (e.g. killed for running out of memory)
+                            before it is failed instead of requeued
+        """
+        self.api_key = api_key
+        self.generator_options = dict(generator_options or {})
+        if max_workers:
+            # Every encode would otherwise use all cores, and max_workers of them at once oversubscribe the host
+            self.generator_options.setdefault("encode_threads", max(1, (os.cpu_count() or 1) // max_workers))
+        self.work_folder = work_folder
+        self.warm_up = warm_up
+        self.lease = lease
+        self.max_crashes = max_crashes
+        self.crashes = {}
+        self.broker = broker
+        self.max_workers = max_workers
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.pool = None
+        self.workers = []
+
+    async def start(self):
+        """Start the worker pool and the requeueing of jobs left behind by dead workers or a previous run."""
+        if self.max_workers:
+            self.pool = self.create_pool()
+            self.workers = [asyncio.create_task(self.worker()) for _ in range(self.max_workers)]
+
+        self.workers.append(asyncio.create_task(self.requeue_stale()))
+
+        for status in (QUEUED, RUNNING):
+            metrics.QUEUE_DEPTH.labels(status).set_function(lambda status=status: self.broker.count(status))
+
+    def create_pool(self):
+        warm_up_modules = lazyimports.RENDER_MODULES if self.warm_up else ()
+        initializer = partial(init_worker, warm_up_modules, self.api_key, self.generator_options.get("tts_options"))
+        pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=initializer)
+        if self.warm_up:
+            for _ in range(self.max_workers):
+                pool.submit(worker_ready)
+
+        return pool
+
+    def replace_pool(self, broken_pool):
+        """
+        A render process that dies (OOM killed, segfault in a native library) breaks the whole pool,
+        every later submission would fail. Swap in a new one, once, however many workers noticed.
+        """
+        if self.pool is broken_pool:
+            logger.error("Render process pool broke, starting a new one")
+            broken_pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = self.create_pool()
+
+    async def stop(self):
+        """Stop taking work. Unfinished jobs stay in the broker, running ones are requeued once their lease runs out."""
+        for worker in self.workers:
+            worker.cancel()
+
+        if self.pool:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+        await asyncio.to_thread(self.broker.close)
+
+    async def submit(self, kind, params):
+        """Persist a job and queue it for rendering."""
+        return await asyncio.to_thread(self.broker.add, kind, params)
+
+    async def get(self, job_id):
+        return await asyncio.to_thread(self.broker.get, job_id)
+
+    async def cancel(self, job_id):
+        """
+        Cancel a job. Queued jobs are never started. A running job is not interrupted: its render process
+        keeps working until the render finishes and the output is then discarded.
+
+        :return: The job after cancellation, or None if it does not exist
+        """
+        # Finished jobs keep their outcome, the status check is part of the write
+        await asyncio.to_thread(self.broker.update, job_id, CANCELLED, expected=(QUEUED, RUNNING))
+        return await self.get(job_id)
+
+    async def requeue_stale(self):
+        """Periodically put running jobs whose worker stopped heartbeating back in the queue."""
+        while True:
+            try:
+                for job_id in await asyncio.to_thread(self.broker.requeue_stale, self.lease):
+                    logger.warning("job_id=%s lost its worker, requeued", job_id)
+            except Exception as e:
+                logger.error("Error requeueing stale jobs: %s", e, exc_info=True)
+
+            await asyncio.sleep(self.lease / 2)
+
+    async def heartbeat(self, job_id):
+        """Keep a running job's lease alive while it renders."""
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            await asyncio.to_thread(self.broker.heartbeat, job_id)
+
+    async def worker(self):
+        """Claim queued jobs from the broker and render them one at a time."""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            job = await asyncio.to_thread(self.broker.claim, self.worker_id, 1.0)
+            if job is None:
+                continue
+
+            job_id = job["id"]
+            logger.info("job_id=%s kind=%s started on %s", job_id, job["kind"], self.worker_id)
+            heartbeat = asyncio.create_task(self.heartbeat(job_id))
+
+            pool = self.pool
+            try:
+                result, report = await loop.run_in_executor(
+                    pool, render_job, self.api_key, job["kind"], job["params"], self.generator_options, job_id, self.work_folder
+                )
+
+            except BrokenProcessPool:
+                self.replace_pool(pool)
+                self.crashes[job_id] = self.crashes.get(job_id, 0) + 1
+
+                # Jobs running next to the one that killed the process fail the same way, give each another go
+                if self.crashes[job_id] <= self.max_crashes:
+                    logger.warning("job_id=%s lost its render process, requeued", job_id)
+                    await asyncio.to_thread(self.broker.requeue, job_id)
+                else:
+                    logger.error("job_id=%s took down its render process %d times, giving up", job_id, self.crashes[job_id])
+                    self.crashes.pop(job_id)
+                    await self.finish(job, FAILED, error="The render process died, the job may need too much memory")
+
+            except Exception as e:
+                self.crashes.pop(job_id, None)
+                logger.error("job_id=%s failed: %s", job_id, e, exc_info=True)
+                await self.finish(job, FAILED, error=str(e))
+
+            else:
+                self.crashes.pop(job_id, None)
+                if await self.finish(job, SUCCEEDED, result=result, report=report):
+                    logger.info("job_id=%s succeeded in %.2fs", job_id, report["seconds"])
+
+            finally:
+                heartbeat.cancel()
+
+    async def finish(self, job, status, result=None, error=None, report=None):
+        """
+        Record the outcome of a job this worker rendered. Only a job that is still running here moves, one
+        cancelled meanwhile stays cancelled and one requeued after its lease ran out belongs to its new worker.
+
+        :return: Whether the outcome was recorded
+        """
+        job_id = job["id"]
+        output = job["params"].get("output")
+
+        if await asyncio.to_thread(self.broker.update, job_id, status, result=result, error=error, expected=(RUNNING,), worker=self.worker_id):
+            if status != SUCCEEDED:
+                await asyncio.to_thread(self.remove_files, output)
+            metrics.record_job(job["kind"], status, report)
+            return True
+
+        current = await self.get(job_id)
+        if current is None or current["status"] == CANCELLED:
+            await asyncio.to_thread(self.remove_files, output, result)
+            metrics.record_job(job["kind"], CANCELLED, report)
+        else:
+            # The output path is shared with the new owner, leave its files alone
+            logger.warning("job_id=%s is %s on %s now, dropping the %s outcome", job_id, current["status"], current["worker"], status)
+
+        return False
+
+    def active_paths(self):
+        """
+        Files and workspaces (on disk and in memory) of queued and running jobs, which the temp reapers must leave alone.
+        """
+        paths = []
+        for job_id in self.broker.unfinished():
+            job = self.broker.get(job_id)
+            if job is None:
+                continue
+
+            params = job["params"]
+            paths += params.get("files", [])
+            paths += [variant["output"] for variant in params.get("variants", [])]
+            workspace = Workspace(self.work_folder, job_id)
+            paths += [params.get("output"), workspace.path, workspace.memory_path]
+
+        return paths
+
+    def remove_files(self, *file_paths):
+        """Delete discarded outputs."""
+        for path in file_paths:
+            try:
+                if path and os.path.exists(path):
+                    os.remove(path)
+            except Exception as e:
+                logger.error("Error deleting %s: %s", path, e)
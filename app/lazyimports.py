@@ -0,0 +1,172 @@
+import importlib
+import logging
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Heavy integrations the render workers always need, preloaded by warm_up
+RENDER_MODULES = ("moviepy", "elevenlabs.client", "aiohttp")
+
+registered = []
+import_seconds = {}
+eager_imports = {} # module -> (seconds, module that was importing it)
+importing = threading.local()
+lock = threading.Lock()
+
+
+def load(name):
+    """Import a module, recording how long it took the first time."""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    elapsed = time.perf_counter() - start
+
+    with lock:
+        import_seconds.setdefault(name, elapsed)
+    logger.debug("Imported %s in %.3fs", name, elapsed)
+
+    return module
+
+
+def eager(name):
+    """
+    Import a module right away and time it for the startup report.
+    Modules imported with eager while it loads are reported under it.
+
+    :return: The module
+    """
+    stack = importing.__dict__.setdefault("stack", [])
+    parent = stack[-1] if stack else None
+    loaded = name in sys.modules
+
+    stack.append(name)
+    start = time.perf_counter()
+    try:
+        module = importlib.import_module(name)
+    finally:
+        stack.pop()
+
+    if not loaded:
+        with lock:
+            eager_imports.setdefault(name, (time.perf_counter() - start, parent))
+
+    return module
+
+
+class LazyModule:
+    """
+    Stands in for a module and imports it on first attribute access,
+    so `ffmpeg.input(...)` style call sites stay unchanged.
+    """
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def __getattr__(self, attr):
+        module = self.__dict__["_module"]
+        if module is None:
+            module = self.__dict__["_module"] = load(self.__dict__["_name"])
+
+        return getattr(module, attr)
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_module"] is not None else "not loaded"
+        return f"<lazy module {self.__dict__['_name']!r} ({state})>"
+
+
+class LazyObject:
+    """
+    Stands in for an object that is expensive to build (an api client) and builds it on first attribute access.
+    """
+
+    def __init__(self, factory):
+        self.__dict__["_factory"] = factory
+        self.__dict__["_instance"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    def __getattr__(self, attr):
+        instance = self.__dict__["_instance"]
+        if instance is None:
+            with self.__dict__["_lock"]:
+                instance = self.__dict__["_instance"]
+                if instance is None:
+                    instance = self.__dict__["_instance"] = self.__dict__["_factory"]()
+
+        return getattr(instance, attr)
+
+
+def lazy(name):
+    """
+    Register a module to be imported on first use.
+
+    :return: LazyModule proxy for it
+    """
+    with lock:
+        if name not in registered:
+            registered.append(name)
+
+    return LazyModule(name)
+
+
+def warm_up(names=None):
+    """
+    Import modules ahead of their first use, e.g. in a render worker before it takes a job.
+    Modules that fail to import are logged and left for the first real use to raise.
+
+    :param names: Modules to import, defaults to every registered module
+    :return: Dict of module -> import seconds
+    """
+    for name in names or list(registered):
+        try:
+            load(name)
+        except ImportError as e:
+            logger.warning("Could not preload %s: %s", name, e)
+
+    return dict(import_seconds)
+
+
+def report():
+    """
+    Import cost of every registered module, None for modules that were not loaded yet.
+
+    :return: List of (module, seconds), most expensive first
+    """
+    with lock:
+        rows = [(name, import_seconds.get(name)) for name in registered]
+
+    return sorted(rows, key=lambda row: -1 if row[1] is None else row[1], reverse=True)
+
+
+def eager_report():
+    """
+    Import cost of every module imported with eager, each followed by the ones it imported.
+
+    :return: List of (depth, module, seconds), most expensive first on every level
+    """
+    with lock:
+        imports = dict(eager_imports)
+
+    rows = []
+
+    def add(parent, depth):
+        children = sorted((name for name, (_, importer) in imports.items() if importer == parent), key=lambda name: imports[name][0], reverse=True)
+        for name in children:
+            rows.append((depth, name, imports[name][0]))
+            add(name, depth + 1)
+
+    add(None, 0)
+    return rows
+
+
+def log_report(startup_seconds=None):
+    """Log the startup time, the cost of the eager imports and the import cost per lazily loaded module."""
+    eager_lines = [f"  {'  ' * depth}{name:<{24 - 2 * depth}} {seconds:.3f}s" for depth, name, seconds in eager_report()]
+    lazy_lines = [f"  {name:<24} {'not loaded' if seconds is None else f'{seconds:.3f}s'}" for name, seconds in report()]
+    header = f"Startup took {startup_seconds:.3f}s" if startup_seconds is not None else "Import timings"
+    logger.info("%s, eager imports:\n%s\nlazily loaded modules:\n%s", header, "\n".join(eager_lines), "\n".join(lazy_lines))
@@ -0,0 +1,72 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+import ffmpeg
+
+logger = logging.getLogger(__name__)
+
+
+class MediaProbe:
+    """
+    Runs ffprobe once per file and caches the metadata by (path, mtime, size), so the same
+    transitions and images aren't probed again for every job. The least recently used entries
+    are dropped once max_entries is reached.
+    """
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def probe(self, path):
+        """
+        Get the metadata of a media file.
+
+        :return: Dict with width, height and duration (None when not applicable) and the raw ffprobe streams
+        """
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime, stat.st_size)
+
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+
+            self.misses += 1
+
+        try:
+            probe = ffmpeg.probe(path)
+        except ffmpeg.Error as e:
+            logger.error("FFprobe failed for %s: %s", path, e.stderr.decode())  # Log the exact error
+            raise
+
+        video_stream = next((stream for stream in probe["streams"] if stream["codec_type"] == "video"), None)
+        duration = probe["format"].get("duration")
+
+        metadata = {
+            "width": int(video_stream["width"]) if video_stream else None,
+            "height": int(video_stream["height"]) if video_stream else None,
+            "duration": float(duration) if duration else None,
+            "streams": probe["streams"],
+        }
+
+        with self.lock:
+            self.entries[key] = metadata
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+        return metadata
+
+    def stats(self):
+        """Hit/miss counters for this process."""
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries)}
+
+
+# Shared by every VideoGenerator in the process so the cache outlives a single job
+media_probe = MediaProbe()
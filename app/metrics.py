@@ -0,0 +1,70 @@
+import logging
+import time
+from contextlib import contextmanager
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest, start_http_server
+
+logger = logging.getLogger(__name__)
+
+# Render stages take from milliseconds (probe, subtitles) to minutes (composite, final encode)
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+STAGE_SECONDS = Histogram("genpipeline_stage_seconds", "Time spent per render pipeline stage", ["stage"], buckets=STAGE_BUCKETS)
+JOB_SECONDS = Histogram("genpipeline_job_seconds", "End to end render job time", ["kind"], buckets=STAGE_BUCKETS)
+JOBS = Counter("genpipeline_jobs_total", "Finished render jobs", ["kind", "status"])
+QUEUE_DEPTH = Gauge("genpipeline_queue_depth", "Render jobs waiting or running", ["status"])
+BYTES_UPLOADED = Counter("genpipeline_uploaded_bytes_total", "Bytes received in uploads")
+BYTES_ENCODED = Counter("genpipeline_encoded_bytes_total", "Bytes of rendered output")
+CACHE_LOOKUPS = Counter("genpipeline_cache_lookups_total", "Cache lookups", ["cache", "result"])
+TEMP_BYTES = Gauge("genpipeline_temp_bytes", "Bytes in a reaped temp folder at the last sweep", ["folder"])
+TEMP_FILES = Gauge("genpipeline_temp_files", "Files in a reaped temp folder at the last sweep", ["folder"])
+TEMP_EVICTED = Counter("genpipeline_temp_evicted_files_total", "Temp files deleted by the reaper", ["folder", "reason"])
+TEMP_EVICTED_BYTES = Counter("genpipeline_temp_evicted_bytes_total", "Bytes of temp files deleted by the reaper", ["folder", "reason"])
+
+
+@contextmanager
+def span(stage, job_id=None, observe=True):
+    """
+    Time a stage, log it with its job id and record it in the stage histogram.
+
+    :param observe: Set to False where the histogram can't be scraped (render worker processes),
+                    their timings are reported back with the job result instead
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        logger.info("stage=%s job_id=%s seconds=%.3f", stage, job_id, elapsed)
+        if observe:
+            STAGE_SECONDS.labels(stage).observe(elapsed)
+
+
+def record_job(kind, status, report=None):
+    """
+    Record a finished render job from the report its worker sent back.
+
+    :param report: {"seconds", "stages": {stage: seconds}, "output_bytes", "caches": {cache: {"hits", "misses"}}}
+    """
+    JOBS.labels(kind, status).inc()
+    if not report:
+        return
+
+    JOB_SECONDS.labels(kind).observe(report["seconds"])
+    for stage, seconds in report.get("stages", {}).items():
+        STAGE_SECONDS.labels(stage).observe(seconds)
+
+    BYTES_ENCODED.inc(report.get("output_bytes", 0))
+
+    for cache, counts in report.get("caches", {}).items():
+        CACHE_LOOKUPS.labels(cache, "hit").inc(counts.get("hits", 0))
+        CACHE_LOOKUPS.labels(cache, "miss").inc(counts.get("misses", 0))
+
+
+def render_latest():
+    """Prometheus text exposition of all metrics, with its content type."""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def start_server(port):
+    """Serve the metrics over http from a background thread, for processes without the api (worker.py)."""
+    start_http_server(port)
@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import os
+from lazyimports import lazy
+
+IN_PROGRESS = ("PENDING", "THROTTLED", "RUNNING")
+
+aiohttp = lazy("aiohttp")
+
+
+class RunwayTaskManager:
+    """
+    Submits RunwayML image to video tasks and tracks them off the event loop.
+    All in-flight tasks are polled together by one background loop whose interval backs off while
+    nothing changes, finished videos are downloaded locally and optionally handed to on_video
+    (used to run them through the subtitle pipeline).
+    """
+
+    def __init__(self, runway, download_folder, on_video=None, min_interval=5.0, max_interval=60.0, max_concurrent_polls=8):
+        """
+        :param runway: RunwayML client
+        :param download_folder: Where finished videos are stored
+        :param on_video: Optional coroutine called as on_video(task) once a task's video is downloaded
+        :param min_interval: Poll interval right after a submission or status change, in seconds
+        :param max_interval: Upper bound of the poll interval while tasks are idle, in seconds
+        :param max_concurrent_polls: Max number of status requests in flight at once
+        """
+        self.runway = runway
+        self.download_folder = download_folder
+        self.on_video = on_video
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.poll_semaphore = asyncio.Semaphore(max_concurrent_polls)
+        self.tasks = {}
+        self.completions = set()
+        self.poller = None
+        self.wakeup = asyncio.Event()
+
+        os.makedirs(self.download_folder, exist_ok=True)
+
+    async def submit(self, prompt, prompt_image, text=None, voice_id=None, model="gen3a_turbo"):
+        """
+        Create an image to video task.
+
+        :param prompt: Text prompt for the video
+        :param prompt_image: Image as a url or data uri
+        :param text: Optional narration, when given the finished clip gets subtitles and audio
+        :param voice_id: Voice used for the narration
+        :return: The task id
+        """
+        # The client is a LazyObject, so even the attribute lookup belongs in the thread: the first one imports runwayml
+        task = await asyncio.to_thread(
+            lambda: self.runway.image_to_video.create(model=model, prompt_image=prompt_image, prompt_text=prompt)
+        )
+
+        self.tasks[task.id] = {
+            "id": task.id,
+            "status": getattr(task, "status", None) or "PENDING",
+            "text": text,
+            "voice_id": voice_id,
+            "output": None,
+            "result": None,
+            "error": None,
+            "video_job_id": None,
+        }
+
+        # Restart polling at the fast interval
+        self.wakeup.set()
+        if self.poller is None or self.poller.done():
+            self.poller = asyncio.create_task(self.poll())
+
+        return task.id
+
+    def get(self, task_id):
+        return self.tasks.get(task_id)
+
+    def in_flight(self):
+        return [task for task in self.tasks.values() if task["status"] in IN_PROGRESS]
+
+    async def poll(self):
+        """Check every in-flight task each round, until none are left."""
+        interval = self.min_interval
+
+        while self.in_flight():
+            self.wakeup.clear()
+
+            results = await asyncio.gather(*(self.refresh(task) for task in self.in_flight()), return_exceptions=True)
+            changed = any(result is True for result in results)
+
+            for result in results:
+                if isinstance(result, Exception):
+                    logging.error(f"Error polling RunwayML task: {result}")
+
+            # Poll quickly while things are happening, back off while every task is still waiting
+            interval = self.min_interval if changed else min(interval * 1.5, self.max_interval)
+
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=interval)
+                interval = self.min_interval
+            except asyncio.TimeoutError:
+                pass
+
+    async def refresh(self, task):
+        """
+        Fetch the status of one task and handle completion.
+
+        :return: True if the status changed
+        """
+        async with self.poll_semaphore:
+            remote = await asyncio.to_thread(lambda: self.runway.tasks.retrieve(task["id"]))
+
+        if remote.status == task["status"]:
+            return False
+
+        task["status"] = remote.status
+
+        if remote.status == "SUCCEEDED":
+            task["output"] = list(remote.output or [])
+            completion = asyncio.create_task(self.complete(task))
+            self.completions.add(completion)
+            completion.add_done_callback(self.completions.discard)
+
+        elif remote.status == "FAILED":
+            task["error"] = getattr(remote, "failure", None) or "Task failed"
+
+        return True
+
+    async def complete(self, task):
+        """Download a finished task's video and pass it on."""
+        try:
+            task["result"] = await self.download(task["output"][0], os.path.join(self.download_folder, f"runway_{task['id']}.mp4"))
+
+            if self.on_video:
+                await self.on_video(task)
+
+        except Exception as e:
+            logging.error(f"Error completing RunwayML task {task['id']}: {e}", exc_info=True)
+            task["error"] = str(e)
+
+    async def download(self, url, path):
+        """Stream a remote file to path."""
+        async with aiohttp.ClientSession() as session:
+            async with session.get(url) as response:
+                response.raise_for_status()
+                with open(path, "wb") as f:
+                    async for chunk in response.content.iter_chunked(1024 * 1024):
+                        await asyncio.to_thread(f.write, chunk)
+
+        return path
+
+    async def stop(self):
+        if self.poller:
+            self.poller.cancel()
@@ -0,0 +1,344 @@
+import os
+import shutil
+import tempfile
+import uuid
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFont
+
+# Overlay subtitles: the concat list of pre-rasterized cue images ends with this suffix
+OVERLAY_SUFFIX = ".ffconcat"
+OVERLAY_LINES = 3 # Lines reserved in the overlay band, cues that wrap further are clipped
+LINE_SPACING = 1.2
+
+# Bold fonts tried in order when the style's font isn't found as a file (Windows, macOS, Linux names)
+FALLBACK_FONTS = ("arialbd.ttf", "Arial Bold.ttf", "DejaVuSans-Bold.ttf", "LiberationSans-Bold.ttf")
+
+
+def group_words(word_list, words_on_screen=3, spoken_time=0.5):
+    """
+    Group word timings into on screen cues. Words are combined while the cue takes less than
+    spoken_time to speak, with at most words_on_screen words per cue.
+
+    :param word_list: List in the format [(word, start_time, end_time), ...]
+    :return: List of cues in the format [[(word, start_time, end_time), ...], ...]
+    """
+    cues = []
+    current = []
+
+    for word, start, end in word_list:
+        if current and end - current[0][1] < spoken_time and len(current) < words_on_screen:
+            current.append((word, start, end))
+        else:
+            if current:
+                cues.append(current)
+            current = [(word, start, end)]
+
+    if current:
+        cues.append(current)
+
+    return cues
+
+
+def format_srt_time(seconds):
+    """Seconds to SRT time format (HH:MM:SS,MMM)."""
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+
+    return f"{hours:02}:{minutes:02}:{seconds:02},{milliseconds:03}"
+
+
+def format_ass_time(seconds):
+    """Seconds to ASS time format (H:MM:SS.cc)."""
+    centiseconds = int(round(seconds * 100))
+    hours, centiseconds = divmod(centiseconds, 360000)
+    minutes, centiseconds = divmod(centiseconds, 6000)
+    seconds, centiseconds = divmod(centiseconds, 100)
+
+    return f"{hours}:{minutes:02}:{seconds:02}.{centiseconds:02}"
+
+
+def escape_ass(text):
+    """Braces and backslashes start override tags in ASS, keep them out of the dialogue text."""
+    return text.replace("\\", "/").replace("{", "(").replace("}", ")")
+
+
+def build_srt(word_list, words_on_screen=3, spoken_time=0.5):
+    """
+    Build SRT subtitles from word timings.
+
+    :return: SRT document as a string
+    """
+    lines = []
+
+    for counter, cue in enumerate(group_words(word_list, words_on_screen, spoken_time), start=1):
+        lines.append(f"{counter}\n{format_srt_time(cue[0][1])} --> {format_srt_time(cue[-1][2])}\n")
+        lines.append(" ".join(word for word, _, _ in cue))
+        lines.append("\n\n")
+
+    return "".join(lines)
+
+
+class AssStyle:
+    """
+    Look of the ASS subtitles. Colours are ASS &HAABBGGRR values, the primary colour is used for
+    words that have been spoken and the secondary colour for words that are still coming up.
+    """
+
+    def __init__(self, font="Arial", font_size=72, primary_colour="&H0000FFFF", secondary_colour="&H00FFFFFF",
+                 outline_colour="&H00000000", outline=4, shadow=0, bold=True, alignment=2, margin_v=320,
+                 width=1080, height=1920):
+        self.font = font
+        self.font_size = font_size
+        self.primary_colour = primary_colour
+        self.secondary_colour = secondary_colour
+        self.outline_colour = outline_colour
+        self.outline = outline
+        self.shadow = shadow
+        self.bold = bold
+        self.alignment = alignment
+        self.margin_v = margin_v
+        self.width = width
+        self.height = height
+
+    def band_height(self):
+        """Height of the overlay band the rasterized cues are drawn into."""
+        return int(self.font_size * LINE_SPACING * OVERLAY_LINES + 2 * self.outline)
+
+    def overlay_y(self):
+        """Top of the overlay band, bottom aligned margin_v above the frame's bottom edge like alignment 2."""
+        return self.height - self.margin_v - self.band_height()
+
+    def header(self):
+        return (
+            "[Script Info]\n"
+            "ScriptType: v4.00+\n"
+            f"PlayResX: {self.width}\n"
+            f"PlayResY: {self.height}\n"
+            "WrapStyle: 0\n"
+            "ScaledBorderAndShadow: yes\n"
+            "\n"
+            "[V4+ Styles]\n"
+            "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, "
+            "Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding\n"
+            f"Style: Default,{self.font},{self.font_size},{self.primary_colour},{self.secondary_colour},{self.outline_colour},&H00000000,"
+            f"{-1 if self.bold else 0},0,0,0,100,100,0,0,1,{self.outline},{self.shadow},{self.alignment},40,40,{self.margin_v},1\n"
+            "\n"
+            "[Events]\n"
+            "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
+        )
+
+
+def build_ass(word_list, words_on_screen=3, spoken_time=0.5, style=None):
+    """
+    Build ASS subtitles with karaoke timing from word timings. Every word in a cue gets a \\k tag
+    lasting until the next word starts, so words light up as they are spoken.
+
+    :return: ASS document as a string
+    """
+    style = style or AssStyle()
+    lines = [style.header()]
+
+    for cue in group_words(word_list, words_on_screen, spoken_time):
+        cue_start = cue[0][1]
+        cue_end = cue[-1][2]
+
+        parts = []
+        for i, (word, start, end) in enumerate(cue):
+            next_start = cue[i + 1][1] if i + 1 < len(cue) else cue_end
+            duration = max(0, int(round((next_start - start) * 100)))
+            parts.append(f"{{\\k{duration}}}{escape_ass(word)}")
+
+        lines.append(f"Dialogue: 0,{format_ass_time(cue_start)},{format_ass_time(cue_end)},Default,,0,0,0,,{' '.join(parts)}\n")
+
+    return "".join(lines)
+
+
+def write_subtitle_file(data, suffix, workspace):
+    """
+    Write subtitles to the memory backed part of the job's workspace when available, so ffmpeg's
+    subtitles filter never touches the disk.
+
+    :param workspace: Workspace of the job, also removes the file if the job never gets to
+    :return: Path of the file, the caller removes it with remove_subtitle_file when done
+    """
+    path = workspace.file(suffix, "subtitles_", memory=True)
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(data)
+
+    return path
+
+
+def remove_subtitle_file(path):
+    """Remove a subtitle file, or an overlay sequence together with its images."""
+    if path.endswith(OVERLAY_SUFFIX):
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+    else:
+        os.remove(path)
+
+
+def ass_colour_to_rgba(colour):
+    """ASS &HAABBGGRR colour to a Pillow RGBA tuple, ASS alpha 00 is opaque."""
+    value = int(colour.lstrip("&H").rstrip("&"), 16)
+    alpha, blue, green, red = (value >> 24) & 0xFF, (value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF
+    return red, green, blue, 255 - alpha
+
+
+@lru_cache(maxsize=16)
+def load_font(name, size, bold=True):
+    """
+    Load a font once per process, Pillow keeps its glyph cache on the font object so every cue reuses it.
+    """
+    candidates = [name, f"{name}.ttf", f"{name} Bold.ttf" if bold else f"{name}.ttf"] + list(FALLBACK_FONTS if bold else ())
+    for candidate in candidates:
+        try:
+            return ImageFont.truetype(candidate, size)
+        except OSError:
+            continue
+
+    return ImageFont.load_default(size)
+
+
+def wrap_words(words, font, max_width):
+    """Split word indices into lines no wider than max_width (a single long word gets a line of its own)."""
+    space = font.getlength(" ")
+    lines = [[]]
+    width = 0.0
+
+    for i, word in enumerate(words):
+        word_width = font.getlength(word)
+        if lines[-1] and width + space + word_width > max_width:
+            lines.append([])
+            width = 0.0
+        width += (space if lines[-1] else 0) + word_width
+        lines[-1].append(i)
+
+    return lines
+
+
+def render_cue_image(words, spoken, style):
+    """
+    Rasterize one cue into a transparent image the size of the overlay band.
+
+    :param words: Words of the cue
+    :param spoken: How many words are already spoken (drawn in the primary colour), the rest use the secondary colour
+    :return: RGBA Pillow image
+    """
+    font = load_font(style.font, style.font_size, style.bold)
+    primary = ass_colour_to_rgba(style.primary_colour)
+    secondary = ass_colour_to_rgba(style.secondary_colour)
+    outline = ass_colour_to_rgba(style.outline_colour)
+
+    band_height = style.band_height()
+    image = Image.new("RGBA", (style.width, band_height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+
+    line_height = style.font_size * LINE_SPACING
+    lines = wrap_words(words, font, style.width - 80)[-OVERLAY_LINES:]
+    space = font.getlength(" ")
+    y = band_height - style.outline - line_height * len(lines) # Bottom aligned, like alignment 2
+
+    for line in lines:
+        line_width = sum(font.getlength(words[i]) for i in line) + space * (len(line) - 1)
+        x = (style.width - line_width) / 2
+
+        for i in line:
+            draw.text((x, y), words[i], font=font, fill=primary if i < spoken else secondary,
+                      stroke_width=style.outline, stroke_fill=outline)
+            x += font.getlength(words[i]) + space
+
+        y += line_height
+
+    return image
+
+
+def build_overlay_sequence(word_list, workspace, words_on_screen=3, spoken_time=0.5, style=None, karaoke=True):
+    """
+    Pre-rasterize the subtitles once, instead of libass drawing them on every output frame.
+    Every cue (and, with karaoke, every word highlight step of it) becomes one transparent PNG and an
+    ffconcat list times them, with a blank image in the gaps, so a single overlay filter composites them.
+    Identical cue states share one image.
+
+    :param workspace: Workspace of the job, the sequence is written to its memory backed part
+    :return: Path of the .ffconcat list, remove it (and its images) with remove_subtitle_file
+    """
+    style = style or AssStyle()
+    folder = workspace.folder("overlay_", memory=True)
+    images = {}
+
+    def image_for(words, spoken):
+        key = (words, spoken)
+        if key not in images:
+            images[key] = f"cue_{len(images)}.png"
+            image = render_cue_image(words, spoken, style) if words else Image.new("RGBA", (style.width, style.band_height()), (0, 0, 0, 0))
+            image.save(os.path.join(folder, images[key]), compress_level=1) # Written once, read once, favour speed
+        return images[key]
+
+    # (start, image) steps, each lasting until the next one starts
+    steps = []
+    for cue in group_words(word_list, words_on_screen, spoken_time):
+        words = tuple(word for word, _, _ in cue)
+        if karaoke:
+            for i, (_, start, _) in enumerate(cue):
+                steps.append((start, image_for(words, i + 1)))
+        else:
+            steps.append((cue[0][1], image_for(words, len(words))))
+        steps.append((cue[-1][2], image_for((), 0)))
+
+    blank = image_for((), 0)
+    lines = ["ffconcat version 1.0\n"]
+    position = 0.0
+    current = blank
+
+    for start, image in steps:
+        if start > position:
+            lines.append(f"file '{current}'\nduration {start - position:.3f}\n")
+            position = start
+        current = image
+
+    # The last entry is listed twice, the concat demuxer ignores the duration of the final file
+    lines.append(f"file '{current}'\nduration 1.000\nfile '{current}'\n")
+
+    path = os.path.join(folder, f"subtitles{OVERLAY_SUFFIX}")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("".join(lines))
+
+    return path
+
+
+if __name__ == "__main__":
+    # Micro-benchmark: current SRT path (string +=, written to disk) against the ASS builder
+    import random
+    import timeit
+    from editvideo import VideoGenerator
+    from workspace import Workspace
+
+    word_count = 10000
+    word_list = []
+    t = 0.0
+    for i in range(word_count):
+        duration = random.uniform(0.1, 0.6)
+        word_list.append((f"word{i}", t, t + duration))
+        t += duration + random.uniform(0, 0.1)
+
+    generator = VideoGenerator.__new__(VideoGenerator) # Skip __init__, only the srt helpers are needed
+    runs = 20
+
+    def current_srt_path():
+        srt_file = os.path.join(tempfile.gettempdir(), f"{uuid.uuid4()}.srt")
+        with open(srt_file, "w", encoding="utf-8") as f:
+            f.write(generator.create_srt_from_dict_timed(word_list))
+        os.remove(srt_file)
+
+    workspace = Workspace(tempfile.gettempdir())
+
+    def ass_path():
+        os.remove(write_subtitle_file(build_ass(word_list), ".ass", workspace))
+
+    for name, fn in (("srt (current)", current_srt_path), ("srt (builder)", lambda: build_srt(word_list)), ("ass (memory file)", ass_path)):
+        seconds = min(timeit.repeat(fn, number=1, repeat=runs))
+        print(f"{name:<20} {seconds * 1000:8.2f} ms for {word_count} words")
+
+    workspace.close()
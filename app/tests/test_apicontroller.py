@@ -0,0 +1,70 @@
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+from fastapi.testclient import TestClient
+import apicontroller
+from broker import SUCCEEDED
+
+
+@pytest.fixture
+def video_app(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config = {
+        "elevenlabs_api_key": "test",
+        "runway_api_key": "test",
+        "instagram_accounts": [],
+        "render_workers": 0,
+        "warm_up_workers": False,
+    }
+    monkeypatch.setattr(apicontroller, "load_config", lambda: config)
+    video_app = apicontroller.VideoApp()
+    yield video_app
+    video_app.jobs.broker.close()
+
+
+def finished_job(video_app, tmp_path, content=b"0123456789" * 100):
+    result = tmp_path / "temp" / "result.mp4"
+    result.write_bytes(content)
+    broker = video_app.jobs.broker
+    job_id = broker.add("image", {})
+    broker.update(job_id, SUCCEEDED, result=str(result))
+    return job_id, result
+
+
+def test_range_requests_are_served_partially(video_app, tmp_path):
+    job_id, _ = finished_job(video_app, tmp_path)
+    client = TestClient(video_app.app)
+
+    response = client.get(f"/videos/{job_id}", headers={"range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.content == b"0123456789"
+    assert response.headers["content-range"] == "bytes 10-19/1000"
+
+    head = client.head(f"/videos/{job_id}")
+    assert head.status_code == 200
+    assert head.headers["content-length"] == "1000"
+    assert head.headers["accept-ranges"] == "bytes"
+
+
+def test_matching_etag_is_not_modified(video_app, tmp_path):
+    job_id, _ = finished_job(video_app, tmp_path)
+    client = TestClient(video_app.app)
+
+    etag = client.get(f"/videos/{job_id}").headers["etag"]
+    revalidated = client.get(f"/videos/{job_id}", headers={"if-none-match": f'"other", {etag}'})
+
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert client.get(f"/videos/{job_id}", headers={"if-none-match": '"other"'}).status_code == 200
+
+
+def test_expired_result_is_gone_and_removed(video_app, tmp_path):
+    job_id, result = finished_job(video_app, tmp_path)
+    video_app.result_ttl = 0
+    client = TestClient(video_app.app)
+
+    assert client.get(f"/videos/{job_id}").status_code == 410
+    assert not result.exists()
+    assert client.get("/videos/unknown").status_code == 404
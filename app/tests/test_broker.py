@@ -0,0 +1,100 @@
+import time
+import pytest
+from broker import CANCELLED, QUEUED, RUNNING, SUCCEEDED, LocalRedis, RedisBroker, SQLiteBroker
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def broker(request, tmp_path):
+    if request.param == "sqlite":
+        broker = SQLiteBroker(str(tmp_path / "jobs.sqlite3"), poll_interval=0.01)
+    else:
+        broker = RedisBroker(LocalRedis())
+    yield broker
+    broker.close()
+
+
+def test_late_cancel_keeps_a_finished_job(broker):
+    job_id = broker.add("image", {})
+    broker.claim("worker", timeout=0.1)
+
+    assert broker.update(job_id, SUCCEEDED, result="out.mp4", expected=(RUNNING,), worker="worker")
+    assert not broker.update(job_id, CANCELLED, expected=(QUEUED, RUNNING))
+    assert broker.get(job_id)["status"] == SUCCEEDED
+    assert broker.get(job_id)["result"] == "out.mp4"
+
+
+def test_outcome_after_cancel_is_dropped(broker):
+    job_id = broker.add("image", {})
+    broker.claim("worker", timeout=0.1)
+
+    assert broker.update(job_id, CANCELLED, expected=(QUEUED, RUNNING))
+    assert not broker.update(job_id, SUCCEEDED, result="out.mp4", expected=(RUNNING,), worker="worker")
+    assert broker.get(job_id)["status"] == CANCELLED
+    assert broker.get(job_id)["result"] is None
+
+
+def test_stale_worker_cannot_finish_its_successors_job(broker):
+    job_id = broker.add("image", {})
+    broker.claim("stale", timeout=0.1)
+    broker.requeue(job_id)
+    broker.claim("successor", timeout=0.1)
+
+    assert not broker.update(job_id, SUCCEEDED, result="out.mp4", expected=(RUNNING,), worker="stale")
+    assert broker.get(job_id)["status"] == RUNNING
+    assert broker.update(job_id, SUCCEEDED, result="out.mp4", expected=(RUNNING,), worker="successor")
+
+
+def test_local_redis_claim_skips_cancelled_jobs():
+    broker = RedisBroker(LocalRedis())
+    cancelled = broker.add("image", {})
+    queued = broker.add("image", {})
+    broker.update(cancelled, CANCELLED)
+
+    assert broker.claim("worker", timeout=0.1)["id"] == queued
+    assert broker.count(RUNNING) == 1
+    assert broker.count(CANCELLED) == 1
+    assert broker.count(QUEUED) == 0
+
+
+def test_claim_does_not_overwrite_a_concurrent_cancel():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    api = RedisBroker(fakeredis.FakeRedis(server=server))
+    interruptions = []
+
+    class InterruptedRedis(fakeredis.FakeRedis):
+        """Runs the queued interruption right after the claim has read the job, before it writes."""
+
+        def pipeline(self, transaction=True, shard_hint=None):
+            pipe = super().pipeline(transaction, shard_hint)
+            hgetall = pipe.hgetall
+
+            def hgetall_then_interrupt(*args):
+                value = hgetall(*args)
+                if interruptions:
+                    interruptions.pop()()
+                return value
+
+            pipe.hgetall = hgetall_then_interrupt
+            return pipe
+
+    worker = RedisBroker(InterruptedRedis(server=server))
+    job_id = api.add("image", {})
+    interruptions.append(lambda: api.update(job_id, CANCELLED))
+
+    assert worker.claim("worker", timeout=0.1) is None
+    assert api.get(job_id)["status"] == CANCELLED
+    assert api.count(RUNNING) == 0
+    assert api.count(CANCELLED) == 1
+
+
+def test_requeue_stale_leaves_jobs_that_heartbeated():
+    broker = RedisBroker(LocalRedis())
+    job_id = broker.add("image", {})
+    broker.claim("worker", timeout=0.1)
+
+    assert broker.requeue_stale(lease=60) == []
+    broker.client.hset(broker.job_key(job_id), "updated", time.time() - 120)
+    assert broker.requeue_stale(lease=60) == [job_id]
+    assert broker.get(job_id)["status"] == QUEUED
+    assert broker.claim("worker", timeout=0.1)["id"] == job_id
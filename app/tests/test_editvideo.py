@@ -0,0 +1,41 @@
+import asyncio
+import os
+import pytest
+from editvideo import VideoGenerator
+from workspace import Workspace
+
+
+@pytest.mark.parametrize("kind", ["image", "video"])
+def test_requested_voice_reaches_tts(tmp_path, monkeypatch, kind):
+    monkeypatch.chdir(tmp_path)
+    generator = VideoGenerator("test")
+    voices = []
+
+    async def text_to_speech(text, voice_id=None):
+        voices.append(voice_id)
+        return b"audio", []
+
+    monkeypatch.setattr(generator, "text_to_speech", text_to_speech)
+    monkeypatch.setattr(generator, "add_subtitles_to_video", lambda output, audio_and_timings, **media: output)
+
+    if kind == "image":
+        asyncio.run(generator.generate_subtitles_image("one two three", ["image.png"], "out.mp4", "voice"))
+    else:
+        asyncio.run(generator.generate_subtitles_video("one two three", "base.mp4", "out.mp4", "voice"))
+
+    assert voices == ["voice"]
+
+
+def test_close_only_removes_its_own_workspace(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    owned = VideoGenerator("test")
+    passed = Workspace(str(tmp_path / "jobs"))
+    borrowing = VideoGenerator("test", workspace=passed)
+    owned_file = owned.workspace.file(".srt")
+    passed_file = borrowing.workspace.file(".srt")
+
+    owned.close()
+    borrowing.close()
+
+    assert not os.path.exists(os.path.dirname(owned_file))
+    assert os.path.isdir(os.path.dirname(passed_file))
@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from elevenapi import elevenlabs_calls
+
+
+@pytest.fixture
+def tts():
+    return elevenlabs_calls("test", cache_dir=None)
+
+
+def aligned(characters):
+    """Alignment the way the api returns it, every character 0.1s long and right after the one before."""
+    characters = list(characters)
+    return {
+        "alignment": {
+            "characters": characters,
+            "character_start_times_seconds": [i * 0.1 for i in range(len(characters))],
+            "character_end_times_seconds": [(i + 1) * 0.1 for i in range(len(characters))],
+        }
+    }
+
+
+def rounded(timings):
+    return [(word, round(start, 3), round(end, 3)) for word, start, end in timings]
+
+
+@pytest.mark.parametrize("text", ["hi there  ", "  hi there", "hi   there"])
+def test_extra_spaces_keep_word_timings(tts, text):
+    start = len(text) - len(text.lstrip())
+    second = text.index("there")
+
+    assert rounded(tts.extract_character_timings(text, aligned(text))) == [
+        ("hi", round(start * 0.1, 3), round((start + 2) * 0.1, 3)),
+        ("there", round(second * 0.1, 3), round((second + 5) * 0.1, 3)),
+    ]
+
+
+def test_devanagari_words_span_all_their_codepoints(tts):
+    """नमस्ते is 6 codepoints (consonants, virama, matras), each aligned on its own."""
+    text = "नमस्ते दुनिया"
+    timings = rounded(tts.extract_character_timings(text, aligned(text)))
+
+    assert timings == [("नमस्ते", 0.0, 0.6), ("दुनिया", 0.7, 1.3)]
+
+
+def test_mismatched_punctuation_uses_the_aligned_words(tts):
+    """The api normalized "Hello , world" to "Hello, world", words come from the alignment so none shift."""
+    timings = rounded(tts.extract_character_timings("Hello , world", aligned("Hello, world")))
+
+    assert timings == [("Hello,", 0.0, 0.6), ("world", 0.7, 1.2)]
+
+
+def test_empty_and_blank_alignments(tts):
+    assert tts.extract_character_timings("", {}) == []
+    assert tts.extract_character_timings("   ", aligned("   ")) == []
+
+
+def test_chunk_timings_are_offset_by_the_audio_before_them(tts, monkeypatch):
+    # 128 kbps mp3: 16000 bytes are one second
+    chunks = {
+        "First one.": (b"a" * 16000, [("First", 0.0, 0.4), ("one.", 0.5, 0.9)]),
+        "Second one.": (b"b" * 8000, [("Second", 0.0, 0.3), ("one.", 0.3, 0.5)]),
+        "Third.": (b"c" * 4000, [("Third.", 0.0, 0.2)]),
+    }
+
+    async def fake_tts(text, voice_id=None):
+        return chunks[text]
+
+    monkeypatch.setattr(tts, "text_to_speech_timestamps", fake_tts)
+    audio, timings = asyncio.run(tts.text_to_speech_timestamps_chunked("First one. Second one. Third.", max_chars=12))
+
+    assert audio == b"a" * 16000 + b"b" * 8000 + b"c" * 4000
+    assert rounded(timings) == [
+        ("First", 0.0, 0.4), ("one.", 0.5, 0.9),
+        ("Second", 1.0, 1.3), ("one.", 1.3, 1.5),
+        ("Third.", 1.5, 1.7),
+    ]
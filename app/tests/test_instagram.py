@@ -0,0 +1,39 @@
+import asyncio
+import pytest
+import instagramPost
+from instagramPost import Instagram
+
+ACCOUNTS = [{"username": "first", "password": "x"}, {"username": "second", "password": "y"}]
+
+
+class RejectingBot:
+    """instabot.Bot whose logins fail."""
+    logins = 0
+
+    def __init__(self, base_path):
+        pass
+
+    def login(self, **kwargs):
+        RejectingBot.logins += 1
+        return False
+
+
+def test_unknown_accounts_are_refused(tmp_path):
+    instagram = Instagram(ACCOUNTS, session_folder=str(tmp_path))
+
+    with pytest.raises(ValueError, match="secnod"):
+        asyncio.run(instagram.post_to_instagram("video.mp4", "caption", usernames=["first", "secnod"]))
+
+    with pytest.raises(ValueError):
+        asyncio.run(instagram.post_to_instagram("video.mp4", "caption", usernames=[]))
+
+
+def test_failed_login_is_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(instagramPost, "instabot", type("instabot", (), {"Bot": RejectingBot}))
+    instagram = Instagram(ACCOUNTS, session_folder=str(tmp_path), max_retries=1, retry_delay=0)
+
+    (result,) = asyncio.run(instagram.post_to_instagram("video.mp4", "caption", usernames=["first"]))
+
+    assert not result["success"] and "Login failed" in result["error"]
+    assert RejectingBot.logins == 2
+    assert instagram.bots == {}
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import time
+import pytest
+import jobqueue
+from broker import CANCELLED, FAILED, RUNNING, SUCCEEDED, SQLiteBroker
+from jobqueue import JobQueue
+
+
+def crashing_render(api_key, kind, params, generator_options=None, job_id=None, work_folder=None):
+    """Dies like an OOM killed render the first time (or every time), then renders."""
+    if kind == "always" or not os.path.exists(params["marker"]):
+        open(params["marker"], "w").close()
+        os._exit(1)
+
+    return params["output"], {"seconds": 0.0, "stages": {}, "output_bytes": 0, "caches": {}}
+
+
+def slow_render(api_key, kind, params, generator_options=None, job_id=None, work_folder=None):
+    time.sleep(1)
+    open(params["output"], "w").close()
+    return params["output"], {"seconds": 1.0, "stages": {}, "output_bytes": 0, "caches": {}}
+
+
+async def run_jobs(queue, jobs, timeout=60):
+    await queue.start()
+    try:
+        job_ids = [await queue.submit(kind, params) for kind, params in jobs]
+        deadline = asyncio.get_running_loop().time() + timeout
+        while any(job["status"] not in (SUCCEEDED, FAILED) for job in [await queue.get(job_id) for job_id in job_ids]):
+            assert asyncio.get_running_loop().time() < deadline, "jobs did not finish"
+            await asyncio.sleep(0.1)
+        return [await queue.get(job_id) for job_id in job_ids]
+    finally:
+        await queue.stop()
+
+
+def test_dead_render_process_is_replaced(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobqueue, "render_job", crashing_render)
+    queue = JobQueue("test", SQLiteBroker(str(tmp_path / "jobs.sqlite3")), max_workers=1)
+
+    retried, poisoned, after = asyncio.run(run_jobs(queue, [
+        ("image", {"marker": str(tmp_path / "retried"), "output": "retried.mp4"}),
+        ("always", {"marker": str(tmp_path / "poisoned"), "output": "poisoned.mp4"}),
+        ("image", {"marker": str(tmp_path / "retried"), "output": "after.mp4"}),
+    ]))
+
+    assert retried["status"] == SUCCEEDED
+    assert poisoned["status"] == FAILED and "render process died" in poisoned["error"]
+    assert after["status"] == SUCCEEDED
+
+
+def test_cancel_while_rendering_wins_over_the_outcome(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobqueue, "render_job", slow_render)
+    queue = JobQueue("test", SQLiteBroker(str(tmp_path / "jobs.sqlite3")), max_workers=1)
+    output = str(tmp_path / "cancelled.mp4")
+
+    async def run():
+        await queue.start()
+        try:
+            job_id = await queue.submit("image", {"output": output})
+            while (await queue.get(job_id))["status"] != RUNNING:
+                await asyncio.sleep(0.05)
+
+            assert (await queue.cancel(job_id))["status"] == CANCELLED
+            await asyncio.sleep(2) # The render finishes and reports back
+            return await queue.get(job_id)
+        finally:
+            await queue.stop()
+
+    job = asyncio.run(run())
+    assert job["status"] == CANCELLED and job["result"] is None
+    assert not os.path.exists(output)
+
+
+def test_render_process_keeps_its_tts_session_across_jobs(monkeypatch):
+    pytest.importorskip("aiohttp")
+    monkeypatch.setattr(jobqueue, "tts_client", None)
+    monkeypatch.setattr(jobqueue, "render_loop", None)
+
+    client = jobqueue.get_tts_client("test", {"cache_dir": None})
+    sessions = [jobqueue.run_in_render_loop(client.get_session()) for _ in range(2)]
+
+    assert jobqueue.get_tts_client("test", {"cache_dir": None}) is client
+    assert sessions[0] is sessions[1] and not sessions[0].closed
+    jobqueue.run_in_render_loop(client.close())
+    jobqueue.render_loop.close()
+
+
+def test_encode_threads_split_the_cores(tmp_path, monkeypatch):
+    monkeypatch.setattr(os, "cpu_count", lambda: 8)
+    broker = SQLiteBroker(str(tmp_path / "jobs.sqlite3"))
+
+    assert JobQueue("test", broker, max_workers=3).generator_options["encode_threads"] == 2
+    assert JobQueue("test", broker, max_workers=16).generator_options["encode_threads"] == 1
+    assert JobQueue("test", broker, max_workers=3, generator_options={"encode_threads": 8}).generator_options["encode_threads"] == 8
+    assert "encode_threads" not in JobQueue("test", broker, max_workers=0).generator_options
+    broker.close()
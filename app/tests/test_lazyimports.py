@@ -0,0 +1,18 @@
+import sys
+import lazyimports
+
+
+def test_eager_imports_are_reported_under_their_importer(tmp_path, monkeypatch):
+    (tmp_path / "eager_parent.py").write_text("from lazyimports import eager\nchild = eager('eager_child')\n")
+    (tmp_path / "eager_child.py").write_text("import time\ntime.sleep(0.05)\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(lazyimports, "eager_imports", {})
+    monkeypatch.delitem(sys.modules, "eager_parent", raising=False)
+    monkeypatch.delitem(sys.modules, "eager_child", raising=False)
+
+    lazyimports.eager("eager_parent")
+    lazyimports.eager("eager_child") # Already loaded, keeps its first timing
+
+    (parent_depth, parent, parent_seconds), (child_depth, child, child_seconds) = lazyimports.eager_report()
+    assert (parent_depth, parent, child_depth, child) == (0, "eager_parent", 1, "eager_child")
+    assert parent_seconds >= child_seconds >= 0.05
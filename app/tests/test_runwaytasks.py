@@ -0,0 +1,53 @@
+import asyncio
+import pytest
+
+runwayml = pytest.importorskip("runwayml")
+
+from fakerunway import FakeRunwayServer
+from runwaytasks import RunwayTaskManager
+
+
+@pytest.fixture
+def server():
+    server = FakeRunwayServer(video=b"runway clip bytes", polls_to_finish=3, fail_prompts={"fail please"}).start()
+    yield server
+    server.stop()
+
+
+async def run_tasks(server, download_folder, prompts):
+    """Submit one task per prompt through the real sdk and wait until every one is finished."""
+    client = runwayml.RunwayML(api_key="test", base_url=server.base_url)
+    finished = []
+
+    async def on_video(task):
+        finished.append(task["id"])
+
+    manager = RunwayTaskManager(client, download_folder, on_video=on_video, min_interval=0.01, max_interval=0.05)
+
+    task_ids = [await manager.submit(prompt, "data:image/png;base64,AAAA", text="three words here") for prompt in prompts]
+    try:
+        await asyncio.wait_for(manager.poller, timeout=10)
+        await asyncio.gather(*manager.completions)
+    finally:
+        await manager.stop()
+
+    return [manager.get(task_id) for task_id in task_ids], finished
+
+
+def test_submit_poll_download(server, tmp_path):
+    (task,), finished = asyncio.run(run_tasks(server, str(tmp_path), ["a calm sea"]))
+
+    assert task["status"] == "SUCCEEDED" and task["error"] is None
+    assert finished == [task["id"]]
+    with open(task["result"], "rb") as f:
+        assert f.read() == b"runway clip bytes"
+    assert server.requests == {"create": 1, "retrieve": 3, "download": 1}
+
+
+def test_failed_task_is_not_downloaded(server, tmp_path):
+    (succeeded, failed), finished = asyncio.run(run_tasks(server, str(tmp_path), ["a calm sea", "fail please"]))
+
+    assert succeeded["status"] == "SUCCEEDED"
+    assert failed["status"] == "FAILED" and failed["error"] and failed["result"] is None
+    assert finished == [succeeded["id"]]
+    assert server.requests["download"] == 1
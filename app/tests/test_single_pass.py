@@ -0,0 +1,82 @@
+import shutil
+import ffmpeg
+import pytest
+from editvideo import VideoGenerator
+
+
+class FakeProbe:
+    """Landscape images and one second transition clips, without running ffprobe."""
+
+    def probe(self, path):
+        return {"width": 1600, "height": 1200, "duration": 1.0, "streams": []}
+
+
+@pytest.fixture
+def generator(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    generator = VideoGenerator("test", engine="ffmpeg")
+    generator.probe = FakeProbe()
+    return generator
+
+
+def make_media(tmp_path):
+    image = str(tmp_path / "image.png")
+    transition = str(tmp_path / "transition.mp4")
+    audio = str(tmp_path / "narration.mp3")
+
+    ffmpeg.input("testsrc2=size=1600x1200:rate=1", f="lavfi").output(image, vframes=1).overwrite_output().run(quiet=True)
+    ffmpeg.input("mandelbrot=size=720x1280:rate=30", f="lavfi", t=1).output(transition, pix_fmt="yuv420p").overwrite_output().run(quiet=True)
+    ffmpeg.input("sine=duration=4", f="lavfi").output(audio).overwrite_output().run(quiet=True)
+
+    return image, transition, audio
+
+
+def test_repeated_inputs_compile(generator):
+    """The same image shown twice and a single transition picked every time used to merge into one input."""
+    images = ["a.png", "b.png", "a.png", "a.png"]
+    args = generator.single_pass_output("out.mp4", images, ["transition.mp4"], "narration.mp3", "subtitles.ass", 8.0).compile()
+
+    inputs = [args[i + 1] for i, arg in enumerate(args) if arg == "-i"]
+    assert inputs.count("a.png") == 1
+    assert inputs.count("transition.mp4") == 3
+
+
+def test_repeated_placement_compiles(generator):
+    """Images shorter than half a transition put several picks of the same clip at the same start."""
+    output = generator.single_pass_output("out.mp4", ["a.png"] * 4, ["transition.mp4"], "narration.mp3", "subtitles.ass", 0.4)
+    assert "split=3" in " ".join(output.compile())
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+def test_repeated_inputs_render(generator, tmp_path):
+    image, transition, audio = make_media(tmp_path)
+    subtitles = str(tmp_path / "subtitles.srt")
+    with open(subtitles, "w", encoding="utf-8") as f:
+        f.write("1\n00:00:00,000 --> 00:00:01,000\nrepeat\n")
+
+    output = str(tmp_path / "out.mp4")
+    generator.single_pass_output(output, [image, image, image], [transition], audio, subtitles, 4.0, width=270, height=480).run(quiet=True)
+
+    _, err = ffmpeg.input(output).output("-", f="null").run(quiet=True)
+    assert "frame=  120" in err.decode()
+
+
+def test_soft_subtitles_are_muxed_on_the_ffmpeg_engine(generator):
+    generator.subtitle_mode = "soft"
+    args = generator.single_pass_output("out.mp4", ["a.png"], ["transition.mp4"], "narration.mp3", "subtitles.srt", 4.0).compile()
+
+    assert "subtitles.srt" in [args[i + 1] for i, arg in enumerate(args) if arg == "-i"]
+    assert "mov_text" in args
+    assert "subtitles=subtitles.srt" not in " ".join(args)
+
+
+def test_soft_stream_copy_honours_faststart(generator, monkeypatch):
+    commands = []
+    monkeypatch.setattr(ffmpeg.nodes.OutputStream, "run", lambda output, **kwargs: commands.append(output.compile()))
+    generator.subtitle_mode = "soft"
+    generator.profile.faststart = False
+
+    generator.render_compatible_video("out.mp4", "base.mp4", "narration.mp3", "subtitles.srt", 4.0)
+
+    assert "copy" in commands[0]
+    assert "-movflags" not in commands[0]
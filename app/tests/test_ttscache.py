@@ -0,0 +1,40 @@
+import os
+from ttscache import TTSCache
+
+
+def test_hits_and_misses_are_counted(tmp_path):
+    cache = TTSCache(str(tmp_path))
+    key = TTSCache.make_key("hello", "voice", "model", {"speed": 1.0})
+
+    assert cache.get(key) is None
+    cache.put(key, b"audio", [("hello", 0.0, 0.5)])
+
+    assert cache.get(key) == (b"audio", [("hello", 0.0, 0.5)])
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_key_changes_with_every_audio_setting():
+    key = TTSCache.make_key("hello", "voice", "model", {"speed": 1.0})
+
+    assert key == TTSCache.make_key("hello", "voice", "model", {"speed": 1.0})
+    assert key != TTSCache.make_key("hello", "other voice", "model", {"speed": 1.0})
+    assert key != TTSCache.make_key("hello", "voice", "other model", {"speed": 1.0})
+    assert key != TTSCache.make_key("hello", "voice", "model", {"speed": 0.9})
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    # Every entry is 100 bytes of audio and a 2 byte "[]" timings file, two fit
+    cache = TTSCache(str(tmp_path), max_bytes=250)
+    cache.put("old", b"o" * 100, [])
+    cache.put("used", b"u" * 100, [])
+    os.utime(cache.paths("old")[1], (1000, 1000))
+    os.utime(cache.paths("used")[1], (2000, 2000))
+
+    # Reading an entry makes it the most recently used, so the older unread one goes first
+    assert cache.get("old") is not None
+    cache.put("new", b"n" * 100, [])
+
+    assert cache.get("used") is None
+    assert cache.get("old") is not None
+    assert cache.get("new") is not None
+    assert sorted(os.listdir(tmp_path)) == ["new.json", "new.mp3", "old.json", "old.mp3"]
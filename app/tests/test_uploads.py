@@ -0,0 +1,129 @@
+import asyncio
+import hashlib
+import os
+import time
+import pytest
+
+pytest.importorskip("python_multipart")
+starlette_requests = pytest.importorskip("starlette.requests")
+
+from uploads import UploadTooLarge, held_uploads, receive_form, release_uploads
+
+BOUNDARY = "testboundary"
+
+
+def multipart_body(fields, files):
+    parts = []
+    for name, value in fields:
+        parts.append(f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, filename, content in files:
+        header = f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\nContent-Type: application/octet-stream\r\n\r\n'
+        parts.append(header.encode() + content + b"\r\n")
+    return b"".join(parts) + f"--{BOUNDARY}--\r\n".encode()
+
+
+def make_request(body, chunk_size=64 * 1024, content_length=True):
+    """Request whose body arrives in chunks, recording how much of it was read."""
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+    state = {"sent": 0}
+
+    async def receive():
+        if state["sent"] < len(chunks):
+            chunk = chunks[state["sent"]]
+            state["sent"] += 1
+            return {"type": "http.request", "body": chunk, "more_body": state["sent"] < len(chunks)}
+        return {"type": "http.disconnect"}
+
+    headers = [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]
+    if content_length:
+        headers.append((b"content-length", str(len(body)).encode()))
+
+    scope = {"type": "http", "method": "POST", "path": "/", "headers": headers, "query_string": b""}
+    return starlette_requests.Request(scope, receive), state, len(chunks)
+
+
+def test_fields_and_deduplicated_files(tmp_path):
+    content = os.urandom(300 * 1024)
+    body = multipart_body([("text", "three words here")], [("files", "a.PNG", content), ("files", "b.png", content)])
+    request, _, _ = make_request(body)
+
+    form = asyncio.run(receive_form(request, str(tmp_path), 1024 * 1024, 10 * 1024 * 1024))
+
+    assert form.get("text") == "three words here"
+    first, second = form.getlist("files")
+    assert first.filename == "a.PNG" and first.size == len(content)
+    assert first.path == second.path == str(tmp_path / f"{hashlib.sha256(content).hexdigest()}.png")
+    assert os.listdir(tmp_path) == [os.path.basename(first.path)]
+
+
+def test_oversized_file_is_rejected_while_streaming(tmp_path):
+    body = multipart_body([], [("files", "small.png", b"x" * 1000), ("files", "big.mp4", b"y" * (4 * 1024 * 1024))])
+    request, state, chunks = make_request(body, content_length=False)
+
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(receive_form(request, str(tmp_path), 1024 * 1024, 100 * 1024 * 1024))
+
+    assert state["sent"] < chunks
+    assert os.listdir(tmp_path) == []
+
+
+def test_announced_oversized_request_is_rejected_up_front(tmp_path):
+    request, state, _ = make_request(multipart_body([], [("files", "big.mp4", b"y" * 4096)]))
+
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(receive_form(request, str(tmp_path), 1024 * 1024, 1024))
+
+    assert state["sent"] == 0
+
+
+def receive(tmp_path, content, max_request_bytes=10 * 1024 * 1024, extra_files=()):
+    body = multipart_body([], [("files", "a.png", content), *extra_files])
+    request, _, _ = make_request(body, content_length=False)
+    return asyncio.run(receive_form(request, str(tmp_path), 1024 * 1024, max_request_bytes))
+
+
+def test_shared_upload_is_kept_while_another_request_holds_it(tmp_path):
+    content = os.urandom(1024)
+    first = receive(tmp_path, content)
+    second = receive(tmp_path, content)
+    path = first.getlist("files")[0].path
+
+    release_uploads(first) # e.g. the first request failed validation
+    assert os.path.exists(path) and path in held_uploads()
+
+    release_uploads(second)
+    release_uploads(second) # Only the first release of a form counts
+    assert not os.path.exists(path) and path not in held_uploads()
+
+
+def test_released_upload_used_by_a_job_is_kept(tmp_path):
+    form = receive(tmp_path, os.urandom(1024))
+    path = form.getlist("files")[0].path
+
+    release_uploads(form, protect=lambda: [path])
+    assert os.path.exists(path)
+
+
+def test_failed_request_keeps_a_file_another_request_reused(tmp_path):
+    content = os.urandom(1024)
+    holder = receive(tmp_path, content)
+    path = holder.getlist("files")[0].path
+
+    with pytest.raises(UploadTooLarge):
+        receive(tmp_path, content, max_request_bytes=1024 * 1024, extra_files=[("files", "big.mp4", b"y" * (2 * 1024 * 1024))])
+
+    assert os.listdir(tmp_path) == [os.path.basename(path)]
+    release_uploads(holder)
+
+
+def test_reused_upload_is_recent_for_the_reaper(tmp_path):
+    content = os.urandom(1024)
+    first = receive(tmp_path, content)
+    path = first.getlist("files")[0].path
+    os.utime(path, (time.time() - 7200, time.time() - 7200))
+
+    second = receive(tmp_path, content)
+    assert time.time() - os.path.getmtime(path) < 60
+
+    release_uploads(first)
+    release_uploads(second)
@@ -0,0 +1,70 @@
+import os
+import time
+import workspace as workspace_module
+from subtitles import build_overlay_sequence, remove_subtitle_file, write_subtitle_file
+from workspace import TempReaper, Workspace, memory_root
+
+
+def test_subtitles_go_to_the_memory_part_of_the_workspace(tmp_path, monkeypatch):
+    monkeypatch.setattr(workspace_module, "MEMORY_FOLDER", str(tmp_path / "shm"))
+    os.makedirs(tmp_path / "shm")
+    workspace = Workspace(str(tmp_path / "work"), "job")
+
+    subtitles = write_subtitle_file("[Script Info]\n", ".ass", workspace)
+    overlay = build_overlay_sequence([("hello", 0.0, 0.5), ("there", 0.5, 1.0)], workspace)
+
+    memory_path = os.path.join(memory_root(str(tmp_path / "work")), "job")
+    assert os.path.dirname(subtitles) == memory_path
+    assert os.path.dirname(os.path.dirname(overlay)) == memory_path
+
+    remove_subtitle_file(overlay)
+    workspace.close()
+    assert not os.path.exists(memory_path)
+
+
+def test_workspace_falls_back_to_disk_without_shm(tmp_path, monkeypatch):
+    monkeypatch.setattr(workspace_module, "MEMORY_FOLDER", str(tmp_path / "missing"))
+    workspace = Workspace(str(tmp_path / "work"), "job")
+
+    assert write_subtitle_file("1\n", ".srt", workspace).startswith(os.path.join(str(tmp_path / "work"), "job"))
+    workspace.close()
+    assert not os.path.exists(tmp_path / "work" / "job")
+
+
+def test_reaper_removes_abandoned_memory_workspaces(tmp_path):
+    root = tmp_path / "memory"
+    for job in ("crashed", "running"):
+        os.makedirs(root / job)
+        (root / job / "subtitles.ass").write_text("x")
+        old = time.time() - 7200
+        os.utime(root / job / "subtitles.ass", (old, old))
+
+    reaper = TempReaper(str(root), max_age=3600, protect=lambda: [str(root / "running")], name="memory", keep_top_level=False)
+    reaper.sweep()
+
+    assert sorted(os.listdir(root)) == ["running"]
+
+
+def test_worker_reaps_its_own_work_and_memory_folders(tmp_path, monkeypatch):
+    from types import SimpleNamespace
+    from worker import create_reapers
+
+    monkeypatch.setattr(workspace_module, "MEMORY_FOLDER", str(tmp_path / "shm"))
+    os.makedirs(tmp_path / "shm")
+    work_folder = str(tmp_path / "work")
+    running = Workspace(work_folder, "running")
+    queue = SimpleNamespace(work_folder=work_folder, active_paths=lambda: [running.path, running.memory_path])
+
+    old = time.time() - 2 * 24 * 3600
+    for job in ("crashed", "running"):
+        for path in (Workspace(work_folder, job).file(".mp4"), Workspace(work_folder, job).file(".ass", memory=True)):
+            open(path, "w").close()
+            os.utime(path, (old, old))
+
+    reapers = create_reapers({}, queue)
+    for reaper in reapers:
+        reaper.sweep()
+
+    assert [reaper.root for reaper in reapers] == [work_folder, memory_root(work_folder)]
+    assert os.listdir(work_folder) == ["running"]
+    assert os.listdir(memory_root(work_folder)) == ["running"]
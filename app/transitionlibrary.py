@@ -0,0 +1,142 @@
+import json
+import logging
+import os
+import threading
+import uuid
+import ffmpeg
+from mediaprobe import media_probe
+
+
+class TransitionLibrary:
+    """
+    Index of the transition clips, pre-transcoded once to the output format.
+    Every clip in source_folder is normalized to width x height @ fps as all-intra h264 so the
+    compositor never has to rescale or seek through long GOPs, and its duration is stored in a
+    manifest so jobs don't have to probe it again.
+    """
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, source_folder="./transitions", normalized_folder="./transitions_normalized", width=1080, height=1920, fps=30):
+        self.source_folder = source_folder
+        self.normalized_folder = normalized_folder
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.lock = threading.Lock()
+        self.manifest = {}
+        self.source_signature = None
+
+        os.makedirs(self.normalized_folder, exist_ok=True)
+        self.manifest = self.load_manifest()
+
+    def load_manifest(self):
+        manifest_path = os.path.join(self.normalized_folder, self.MANIFEST)
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_manifest(self):
+        manifest_path = os.path.join(self.normalized_folder, self.MANIFEST)
+        tmp_path = f"{manifest_path}.{uuid.uuid4().hex}.tmp"
+
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+
+        os.replace(tmp_path, manifest_path)
+
+    def signature(self):
+        """Cheap fingerprint of the source folder, changes whenever a clip is added, removed or replaced."""
+        entries = []
+        for name in sorted(os.listdir(self.source_folder)):
+            stat = os.stat(os.path.join(self.source_folder, name))
+            entries.append((name, stat.st_mtime, stat.st_size))
+
+        return entries
+
+    def refresh(self):
+        """
+        Normalize new or changed clips and drop the ones that were removed.
+        Does nothing when the source folder has not changed since the last refresh.
+        """
+        with self.lock:
+            signature = self.signature()
+            if signature == self.source_signature:
+                return
+
+            changed = False
+            sources = {name: (mtime, size) for name, mtime, size in signature}
+
+            for name in list(self.manifest):
+                if name not in sources:
+                    self.remove_normalized(self.manifest.pop(name))
+                    changed = True
+
+            for name, (mtime, size) in sources.items():
+                entry = self.manifest.get(name)
+                if entry and entry["source_mtime"] == mtime and entry["source_size"] == size and os.path.exists(entry["path"]):
+                    continue
+
+                try:
+                    self.manifest[name] = self.normalize(name, mtime, size)
+                    changed = True
+                except ffmpeg.Error as e:
+                    logging.error(f"Failed to normalize transition {name}: {e.stderr.decode() if e.stderr else e}")
+
+            if changed:
+                self.save_manifest()
+
+            self.source_signature = signature
+
+    def normalize(self, name, mtime, size):
+        """
+        Transcode one clip to the output resolution and frame rate, cropping it to fill the frame.
+
+        :return: Manifest entry for the clip
+        """
+        source = os.path.join(self.source_folder, name)
+        output = os.path.abspath(os.path.join(self.normalized_folder, f"{os.path.splitext(name)[0]}_{self.width}x{self.height}_{self.fps}.mp4"))
+        tmp_output = f"{output}.{uuid.uuid4().hex}.mp4"
+
+        (
+            ffmpeg.input(source).video
+            .filter("scale", self.width, self.height, force_original_aspect_ratio="increase")
+            .filter("crop", self.width, self.height)
+            .filter("fps", fps=self.fps)
+            .output(tmp_output, vcodec="libx264", pix_fmt="yuv420p", g=1, crf=18, an=None)
+            .overwrite_output()
+            .run(quiet=True)
+        )
+        os.replace(tmp_output, output)
+
+        return {
+            "path": output,
+            "duration": media_probe.probe(output)["duration"],
+            "source_mtime": mtime,
+            "source_size": size,
+        }
+
+    def remove_normalized(self, entry):
+        try:
+            os.remove(entry["path"])
+        except OSError:
+            pass
+
+    def clips(self):
+        """Paths of all normalized transition clips."""
+        self.refresh()
+        return [entry["path"] for entry in self.manifest.values()]
+
+    def duration(self, clip_path):
+        """
+        Duration of a normalized clip from the manifest.
+
+        :return: Duration in seconds, or None if the clip is not in the library
+        """
+        for entry in self.manifest.values():
+            if entry["path"] == clip_path:
+                return entry["duration"]
+
+        return None
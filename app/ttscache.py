@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+
+class TTSCache:
+    """
+    Content addressed disk cache for text to speech results.
+    Every entry is an audio file plus a json file with the word timings, named by the hash of
+    everything that affects the generated audio. The least recently used entries are evicted
+    once the cache grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir="./temp/tts_cache", max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(text, voice_id, model_id, voice_settings):
+        """
+        Hash the request parameters that decide the audio output.
+
+        :return: Hex digest used as the entry name
+        """
+        request = json.dumps([text, voice_id, model_id, voice_settings], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(request.encode("utf-8")).hexdigest()
+
+    def paths(self, key):
+        return os.path.join(self.cache_dir, f"{key}.mp3"), os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        """
+        Look up a cached result.
+
+        :return: (audio_bytes, word_timing_map) or None on a miss
+        """
+        audio_path, timings_path = self.paths(key)
+
+        try:
+            with open(timings_path, "r", encoding="utf-8") as f:
+                word_timing_map = [tuple(word) for word in json.load(f)]
+
+            with open(audio_path, "rb") as f:
+                audio_bytes = f.read()
+
+            # Bump the modification time so eviction sees this entry as recently used
+            os.utime(timings_path)
+
+        except (OSError, ValueError):
+            with self.lock:
+                self.misses += 1
+            return None
+
+        with self.lock:
+            self.hits += 1
+
+        return (audio_bytes, word_timing_map)
+
+    def put(self, key, audio_bytes, word_timing_map):
+        """Store a result and evict old entries if the cache is over its size limit."""
+        audio_path, timings_path = self.paths(key)
+
+        # The timings file is written last because it marks the entry as complete
+        self.write_atomic(audio_path, audio_bytes)
+        self.write_atomic(timings_path, json.dumps(word_timing_map, ensure_ascii=False).encode("utf-8"))
+
+        self.evict()
+
+    def write_atomic(self, path, data):
+        """Write to a temporary name first so a concurrent reader never sees a partial file."""
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+
+        os.replace(tmp_path, path)
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        total_size = 0
+
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+
+            key = name[:-len(".json")]
+            audio_path, timings_path = self.paths(key)
+
+            try:
+                size = os.path.getsize(audio_path) + os.path.getsize(timings_path)
+                last_used = os.path.getmtime(timings_path)
+            except OSError:
+                continue
+
+            entries.append((last_used, size, key))
+            total_size += size
+
+        entries.sort()
+
+        for last_used, size, key in entries:
+            if total_size <= self.max_bytes:
+                break
+
+            for path in reversed(self.paths(key)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+            total_size -= size
+
+    def stats(self):
+        """Hit/miss counters for this process."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,286 @@
+import asyncio
+import hashlib
+import os
+import threading
+import uuid
+from collections import Counter
+from python_multipart.multipart import MultipartParser, parse_options_header
+import metrics
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Stored uploads are shared by content hash, so a file one request received may be the input another request
+# is still validating or posting. Every request holds its files until it is done with them.
+held = Counter()
+held_lock = threading.Lock()
+
+
+class UploadTooLarge(Exception):
+    """An upload or the request it belongs to went over its size limit."""
+
+
+class MalformedUpload(ValueError):
+    """The request body is not a valid multipart form."""
+
+
+class StoredUpload:
+    """A file of a multipart form, already written to the upload folder."""
+
+    def __init__(self, filename, path, size, content_type=None):
+        self.filename = filename
+        self.path = path
+        self.size = size
+        self.content_type = content_type
+
+    def __repr__(self):
+        return f"StoredUpload({self.filename!r}, {self.path!r}, {self.size})"
+
+
+class UploadedForm:
+    """Fields and stored files of a multipart form, in the order they were sent."""
+
+    def __init__(self):
+        self.fields = {}
+        self.files = {}
+        self.released = False # The request's holds on the files were dropped, see release_uploads
+
+    def get(self, name, default=None):
+        """First value of a text field."""
+        values = self.fields.get(name)
+        return values[0] if values else default
+
+    def getlist(self, name):
+        """Every file sent under name."""
+        return self.files.get(name, [])
+
+    def paths(self):
+        return [upload.path for uploads in self.files.values() for upload in uploads]
+
+
+class StreamingFormParser:
+    """
+    Incremental multipart/form-data parser. File parts are hashed and written to the upload folder as the
+    body arrives, so the size limits apply while receiving and every byte is written to disk once.
+    Files are stored by content hash, so re-uploading an identical asset reuses the stored copy. Every stored
+    file is held for the request until it calls release_uploads.
+    """
+
+    def __init__(self, boundary, upload_folder, max_upload_bytes, max_request_bytes, max_field_bytes=1024 * 1024, protect=None):
+        """
+        :param boundary: Multipart boundary from the Content-Type header
+        :param max_upload_bytes: Limit for each file
+        :param max_request_bytes: Limit for the whole body
+        :param max_field_bytes: Limit for each text field
+        :param protect: Optional callable returning paths used by queued or running jobs, kept if the request fails
+        """
+        self.upload_folder = upload_folder
+        self.max_upload_bytes = max_upload_bytes
+        self.max_request_bytes = max_request_bytes
+        self.max_field_bytes = max_field_bytes
+        self.protect = protect
+        self.form = UploadedForm()
+        self.created = [] # Files this request added to the upload folder, removed again if it fails
+        self.received = 0
+        self.finished = False
+
+        self.headers = {}
+        self.header_field = bytearray()
+        self.header_value = bytearray()
+        self.part = None
+
+        self.parser = MultipartParser(boundary, {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_end": self.on_end,
+        })
+
+    def write(self, data):
+        """Feed the next piece of the body, does blocking file io."""
+        self.received += len(data)
+        if self.received > self.max_request_bytes:
+            raise UploadTooLarge("Request is too large.")
+
+        self.parser.write(data)
+
+    def finalize(self):
+        self.parser.finalize()
+        if not self.finished:
+            raise MalformedUpload("Multipart body ended early.")
+
+    def abort(self):
+        """Remove the partial file and whatever this request stored, unless another request or a job uses it."""
+        if self.part and self.part.get("buffer"):
+            self.part["buffer"].close()
+            remove(self.part["tmp_path"])
+
+        release_uploads(self.form, self.protect, removable=self.created)
+
+    def on_part_begin(self):
+        self.headers = {}
+        self.part = None
+
+    def on_header_field(self, data, start, end):
+        self.header_field += data[start:end]
+
+    def on_header_value(self, data, start, end):
+        self.header_value += data[start:end]
+
+    def on_header_end(self):
+        self.headers[bytes(self.header_field).lower()] = bytes(self.header_value)
+        self.header_field.clear()
+        self.header_value.clear()
+
+    def on_headers_finished(self):
+        disposition, options = parse_options_header(self.headers.get(b"content-disposition", b""))
+        if disposition != b"form-data" or b"name" not in options:
+            raise MalformedUpload("Form part without a name.")
+
+        name = options[b"name"].decode("utf-8")
+
+        if b"filename" not in options:
+            self.part = {"name": name, "value": bytearray()}
+            return
+
+        tmp_path = os.path.join(self.upload_folder, f"{uuid.uuid4()}.part")
+        self.part = {
+            "name": name,
+            "filename": options[b"filename"].decode("utf-8"),
+            "content_type": self.headers.get(b"content-type", b"").decode("latin-1") or None,
+            "tmp_path": tmp_path,
+            "buffer": open(tmp_path, "wb"),
+            "hasher": hashlib.sha256(),
+            "size": 0,
+        }
+
+    def on_part_data(self, data, start, end):
+        chunk = data[start:end]
+
+        if "value" in self.part:
+            self.part["value"] += chunk
+            if len(self.part["value"]) > self.max_field_bytes:
+                raise UploadTooLarge(f"Field {self.part['name']} is too large.")
+            return
+
+        self.part["size"] += len(chunk)
+        if self.part["size"] > self.max_upload_bytes:
+            raise UploadTooLarge(f"Upload {self.part['filename']} is too large.")
+
+        self.part["hasher"].update(chunk)
+        self.part["buffer"].write(chunk)
+
+    def on_part_end(self):
+        part, self.part = self.part, None
+
+        if "value" in part:
+            self.form.fields.setdefault(part["name"], []).append(part["value"].decode("utf-8"))
+            return
+
+        part["buffer"].close()
+        extension = os.path.splitext(part["filename"])[1].lower()
+        file_path = os.path.join(self.upload_folder, f"{part['hasher'].hexdigest()}{extension}")
+
+        metrics.BYTES_UPLOADED.inc(part["size"])
+
+        with held_lock:
+            if os.path.exists(file_path):
+                # Identical upload already stored, keep the existing copy and make it recent again for the temp reaper
+                remove(part["tmp_path"])
+                os.utime(file_path)
+            else:
+                os.replace(part["tmp_path"], file_path)
+                self.created.append(file_path)
+            held[file_path] += 1
+
+        upload = StoredUpload(part["filename"], file_path, part["size"], part["content_type"])
+        self.form.files.setdefault(part["name"], []).append(upload)
+
+    def on_end(self):
+        self.finished = True
+
+
+def release_uploads(form, protect=None, removable=None):
+    """
+    Drop a request's holds on its stored uploads, only the first call for a form has an effect. Files no
+    request holds anymore are deleted, unless protect reports them in use by a queued or running job.
+
+    :param form: UploadedForm of the request
+    :param protect: Optional callable returning paths that are still in use
+    :param removable: Only these paths may be deleted, None allows all of them
+    """
+    if form.released:
+        return
+    form.released = True
+
+    with held_lock:
+        unheld = []
+        for path in form.paths():
+            held[path] -= 1
+            if held[path] <= 0:
+                del held[path]
+                if removable is None or path in removable:
+                    unheld.append(path)
+
+        if unheld:
+            # Asked under the lock, so a request handing the same file over to its new job can't slip in between
+            protected = {os.path.abspath(path) for path in (protect() if protect else ()) if path}
+            for path in unheld:
+                if os.path.abspath(path) not in protected:
+                    remove(path)
+
+
+def held_uploads():
+    """Stored uploads that requests in flight still hold, for the temp reaper to leave alone."""
+    with held_lock:
+        return list(held)
+
+
+def remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def receive_form(request, upload_folder, max_upload_bytes, max_request_bytes, protect=None):
+    """
+    Read a multipart form straight from the request stream, instead of letting Starlette spool the whole
+    body to a temporary file before the limits can be checked. The form's files are held until the
+    request passes them to release_uploads.
+
+    :param request: Starlette request whose body has not been read yet
+    :param protect: Optional callable returning paths used by queued or running jobs
+    :return: UploadedForm
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not options.get(b"boundary"):
+        raise MalformedUpload("Expected a multipart/form-data body.")
+
+    # Refuse announced oversized bodies before receiving any of them
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_request_bytes:
+        raise UploadTooLarge("Request is too large.")
+
+    parser = StreamingFormParser(options[b"boundary"], upload_folder, max_upload_bytes, max_request_bytes, protect=protect)
+    pending = bytearray()
+
+    try:
+        async for chunk in request.stream():
+            pending += chunk
+            # Hash and write in larger pieces off the event loop
+            if len(pending) >= UPLOAD_CHUNK_SIZE:
+                await asyncio.to_thread(parser.write, bytes(pending))
+                pending.clear()
+
+        await asyncio.to_thread(parser.write, bytes(pending))
+        await asyncio.to_thread(parser.finalize)
+
+    except BaseException:
+        await asyncio.to_thread(parser.abort)
+        raise
+
+    return parser.form
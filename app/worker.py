@@ -0,0 +1,101 @@
+"""
+Standalone render worker. Claims jobs from the broker configured in config.yaml and renders them,
+so rendering can scale out over several processes and hosts while the api only queues jobs
+(set render_workers: 0 for the api then).
+
+Every worker needs the same config.yaml and the api's shared_folder mounted at the same path,
+uploads are read from and results written to it.
+
+    python worker.py --workers 4 --metrics-port 9101
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+from appconfig import load_config
+from broker import create_broker
+from jobqueue import JobQueue, configure_worker_logging, generator_options_from_config
+from workspace import TempReaper, memory_root
+import metrics
+
+
+def create_reapers(config, queue):
+    """
+    The api's reapers only see its own host, so every worker keeps the workspaces of its crashed renders in
+    check itself: the work folder on disk and its memory backed twin in /dev/shm.
+    """
+    interval = config.get("temp_sweep_interval", 300)
+    reapers = [TempReaper(
+        queue.work_folder,
+        max_bytes=config.get("work_max_bytes", 10 * 1024 * 1024 * 1024),
+        max_age=config.get("work_max_age", 24 * 3600),
+        interval=interval,
+        protect=queue.active_paths,
+        name="work",
+        keep_top_level=False,
+    )]
+
+    memory_folder = memory_root(queue.work_folder)
+    if memory_folder:
+        reapers.append(TempReaper(
+            memory_folder,
+            max_bytes=config.get("memory_max_bytes", 512 * 1024 * 1024),
+            max_age=config.get("memory_max_age", 3600),
+            interval=interval,
+            protect=queue.active_paths,
+            name="memory",
+            keep_top_level=False,
+        ))
+
+    return reapers
+
+
+async def run(queue, reapers=()):
+    await queue.start()
+    for reaper in reapers:
+        await reaper.start()
+
+    try:
+        await asyncio.Event().wait() # Render until interrupted
+    finally:
+        for reaper in reapers:
+            await reaper.stop()
+        await queue.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="config.yaml", help="Config file, relative to this script")
+    parser.add_argument("--workers", type=int, default=None, help="Render processes, defaults to render_workers from the config")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve this worker's Prometheus metrics on this port")
+    args = parser.parse_args()
+
+    configure_worker_logging()
+    config = load_config(args.config)
+    temp_folder = "./temp"
+    os.makedirs(temp_folder, exist_ok=True)
+
+    if args.metrics_port:
+        metrics.start_server(args.metrics_port)
+
+    queue = JobQueue(
+        config["elevenlabs_api_key"],
+        create_broker(config, os.path.join(temp_folder, "jobs.sqlite3")),
+        max_workers=args.workers or config.get("render_workers", 2) or 1,
+        work_folder=os.path.join(temp_folder, "work"),
+        warm_up=config.get("warm_up_workers", True),
+        lease=config.get("job_lease", 60),
+        generator_options=generator_options_from_config(config),
+    )
+    logging.getLogger(__name__).info("Render worker %s started with %d processes", queue.worker_id, queue.max_workers)
+
+    try:
+        asyncio.run(run(queue, create_reapers(config, queue)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support() # Render processes of a frozen build re-run this executable
+    main()
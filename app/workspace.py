@@ -0,0 +1,241 @@
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import time
+import uuid
+import metrics
+
+logger = logging.getLogger(__name__)
+
+MEMORY_FOLDER = "/dev/shm"
+
+
+def memory_root(root):
+    """
+    Memory backed twin of a workspace root, e.g. /dev/shm/genpipeline_<hash of root>, or None where there is
+    no writable /dev/shm (Windows, macOS). Keyed by the root so deployments sharing a host don't reap each other.
+    """
+    if not (os.path.isdir(MEMORY_FOLDER) and os.access(MEMORY_FOLDER, os.W_OK)):
+        return None
+
+    digest = hashlib.sha1(os.path.abspath(root).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(MEMORY_FOLDER, f"genpipeline_{digest}")
+
+
+class Workspace:
+    """
+    Scoped directory for the intermediate files of one job. Everything in it is removed
+    together when the workspace is closed, whether the job succeeded or not.
+
+    Small files that are read back right away (subtitles, overlay images) can go to a memory backed
+    sub-directory instead, which lives under memory_root(root) and is named after the workspace, so
+    the files of a crashed job are found and reaped like the ones on disk.
+    """
+
+    def __init__(self, root="./temp/work", name=None):
+        """
+        :param root: Folder the workspaces are created in
+        :param name: Directory name, e.g. the job id, defaults to a random one
+        """
+        name = name or str(uuid.uuid4())
+        self.path = os.path.join(root, name)
+        memory_folder = memory_root(root)
+        self.memory_path = os.path.join(memory_folder, name) if memory_folder else os.path.join(self.path, "memory")
+        self.created = set()
+
+    def folder(self, prefix="", memory=False):
+        """
+        New empty directory in the workspace.
+
+        :param memory: Create it in the memory backed sub-directory (on disk where there is none)
+        """
+        path = os.path.join(self.base(memory), f"{prefix}{uuid.uuid4()}")
+        os.makedirs(path)
+        return path
+
+    def file(self, suffix="", prefix="", memory=False):
+        """
+        Path for a new intermediate file, the directory is only created once it is first needed.
+
+        :param memory: Put the file in the memory backed sub-directory (on disk where there is none)
+        """
+        return os.path.join(self.base(memory), f"{prefix}{uuid.uuid4()}{suffix}")
+
+    def base(self, memory):
+        path = self.memory_path if memory else self.path
+        if path not in self.created:
+            os.makedirs(path, exist_ok=True)
+            self.created.add(path)
+
+        return path
+
+    def close(self):
+        """Remove the workspace and everything in it."""
+        if self.created:
+            for path in (self.path, self.memory_path):
+                shutil.rmtree(path, ignore_errors=True)
+            self.created.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TempReaper:
+    """
+    Keeps the temp folder within its limits. Every sweep deletes files older than max_age and, if the
+    folder is still over max_bytes, the least recently modified files until it fits. Paths reported by
+    protect (inputs and outputs of unfinished jobs) and excluded entries are never touched.
+    """
+
+    def __init__(self, root, max_bytes=10 * 1024 * 1024 * 1024, max_age=24 * 3600, interval=300, protect=None, exclude=(), name="temp", keep_top_level=True):
+        """
+        :param root: Folder to keep in check
+        :param max_bytes: Quota for the folder, None disables size based eviction
+        :param max_age: Seconds since last modification after which a file is deleted, None disables age based eviction
+        :param interval: Seconds between sweeps
+        :param protect: Optional callable returning paths (files or folders) that are still in use
+        :param exclude: Entries of root that manage their own size (e.g. the tts cache, the job database)
+        :param name: Label of the folder in the metrics
+        :param keep_top_level: Keep emptied direct children of root (uploads, work, ...) that the app writes into,
+                               turn it off for roots whose children are per job workspaces
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.interval = interval
+        self.protect = protect
+        self.exclude = [os.path.abspath(os.path.join(root, entry)) for entry in exclude]
+        self.name = name
+        self.keep_top_level = keep_top_level
+        self.task = None
+        self.last_usage = (0, 0)
+
+        metrics.TEMP_BYTES.labels(name).set_function(lambda: self.last_usage[0])
+        metrics.TEMP_FILES.labels(name).set_function(lambda: self.last_usage[1])
+
+    def files(self):
+        """(path, size, mtime) of every file under root that may be evicted."""
+        entries = []
+        for folder, subfolders, filenames in os.walk(self.root):
+            subfolders[:] = [name for name in subfolders if not self.is_excluded(os.path.join(folder, name))]
+
+            for filename in filenames:
+                path = os.path.join(folder, filename)
+                if self.is_excluded(path):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+
+        return entries
+
+    def is_excluded(self, path):
+        path = os.path.abspath(path)
+        return any(path == entry or path.startswith(entry + "-") for entry in self.exclude)
+
+    def protected(self):
+        return {os.path.abspath(path) for path in (self.protect() if self.protect else ()) if path}
+
+    @staticmethod
+    def is_protected(path, protected):
+        """Whether path or one of the folders containing it is in use."""
+        path = os.path.abspath(path)
+        while True:
+            if path in protected:
+                return True
+            parent = os.path.dirname(path)
+            if parent == path:
+                return False
+            path = parent
+
+    def sweep(self):
+        """
+        Run one eviction pass.
+
+        :return: (bytes in use, files left) after the sweep
+        """
+        protected = self.protected()
+        now = time.time()
+        entries = sorted(self.files(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        kept = []
+
+        for path, size, mtime in entries:
+            if self.is_protected(path, protected):
+                kept.append((path, size, mtime))
+                continue
+
+            if self.max_age is not None and now - mtime > self.max_age:
+                total -= self.remove(path, size, "age")
+            else:
+                kept.append((path, size, mtime))
+
+        # Oldest first until the folder fits its quota
+        if self.max_bytes is not None:
+            for path, size, mtime in kept:
+                if total <= self.max_bytes:
+                    break
+                if not self.is_protected(path, protected):
+                    total -= self.remove(path, size, "quota")
+
+        self.remove_empty_folders(protected)
+
+        files = len(self.files())
+        self.last_usage = (total, files)
+        return self.last_usage
+
+    def remove(self, path, size, reason):
+        """Delete one file, returning the bytes freed."""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return size
+        except OSError as e:
+            logger.error("Error deleting %s: %s", path, e)
+            return 0
+
+        metrics.TEMP_EVICTED.labels(self.name, reason).inc()
+        metrics.TEMP_EVICTED_BYTES.labels(self.name, reason).inc(size)
+        logger.debug("Evicted %s (%s, %d bytes)", path, reason, size)
+        return size
+
+    def remove_empty_folders(self, protected):
+        """
+        Drop folders the sweep emptied, e.g. abandoned job workspaces.
+        Direct children of root (uploads, work, ...) are kept with keep_top_level since the app writes into them.
+        """
+        root = os.path.abspath(self.root)
+        for folder, subfolders, filenames in os.walk(self.root, topdown=False):
+            folder = os.path.abspath(folder)
+            if folder == root or (self.keep_top_level and os.path.dirname(folder) == root) or filenames:
+                continue
+            if self.is_excluded(folder) or self.is_protected(folder, protected):
+                continue
+            try:
+                os.rmdir(folder)
+            except OSError:
+                pass # Not empty or already gone
+
+    async def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def run(self):
+        while True:
+            try:
+                usage, files = await asyncio.to_thread(self.sweep)
+                logger.info("Temp folder %s holds %d files, %.1f MB", self.root, files, usage / (1024 * 1024))
+            except Exception as e:
+                logger.error("Error sweeping %s: %s", self.root, e, exc_info=True)
+
+            await asyncio.sleep(self.interval)
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()